@@ -0,0 +1,150 @@
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from google.adk.agents import Agent
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models import BaseLlm
+from google.adk.models.registry import LLMRegistry
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from metropulse_common.model_wrappers import ModelWrapper
+from metropulse_common.telemetry import instrument_model_calls, span
+
+USER_ID = "user_1"
+INSTRUCTION_STATE_KEY = "system_instruction"
+NO_RESPONSE_TEXT = "Agent did not produce a final response."
+
+
+@dataclass(frozen=True)
+class AgentRole:
+    """Static description of one agent role served by the registry."""
+    name: str
+    app_name: str
+    model: str
+    description: str
+    tools: Tuple[Any, ...] = field(default_factory=tuple)
+
+
+def _instruction_from_state(ctx: ReadonlyContext) -> str:
+    """Per-request system prompt, read from the session instead of baked into the agent."""
+    return ctx.state.get(INSTRUCTION_STATE_KEY, "")
+
+
+# A model name or instance used for every role, or a factory building one per role
+ModelOverride = Union[str, BaseLlm, Callable[[AgentRole], BaseLlm]]
+
+
+def wrap_models(model_override: Optional[Callable[[AgentRole], BaseLlm]],
+                wrapper: ModelWrapper) -> Callable[[AgentRole], BaseLlm]:
+    """
+    A model factory that builds each role's model as before (from
+    `model_override`, else the role's model name) and hands it to `wrapper`
+    under the role's name.
+    Wrappers applied later sit outside earlier ones, so calls pass through
+    them first.
+    """
+    def model_for_role(role: AgentRole) -> BaseLlm:
+        inner = model_override(role) if model_override else LLMRegistry.new_llm(role.model)
+        return wrapper(role.name, inner) or inner
+
+    return model_for_role
+
+
+class AgentRegistry:
+    """
+    Owns one long-lived Agent + Runner per role and hands out a fresh,
+    uniquely named session for every request.
+
+    The system prompt differs per request (it embeds the event details), so
+    it is stored in the session state and read by an instruction provider,
+    which lets a single agent instance serve all requests concurrently.
+    """
+
+    def __init__(self, model_override: Optional[ModelOverride] = None):
+        self.session_service = InMemorySessionService()
+        self._runners: Dict[str, Runner] = {}
+        self._model_override = model_override
+
+    def register(self, role: AgentRole) -> Runner:
+        """Build (once) and return the runner for the given role."""
+        runner = self._runners.get(role.name)
+        if runner is None:
+            model = self._model_override or role.model
+            if callable(model):
+                model = model(role)
+            agent = Agent(
+                name=role.name,
+                model=model,
+                description=role.description,
+                instruction=_instruction_from_state,
+                tools=list(role.tools),
+            )
+            instrument_model_calls(agent)
+            runner = Runner(
+                agent=agent,
+                app_name=role.app_name,
+                session_service=self.session_service,
+            )
+            self._runners[role.name] = runner
+        return runner
+
+    @asynccontextmanager
+    async def session(self, role: AgentRole, state: Optional[Dict[str, Any]] = None):
+        """Create a unique session for one request and delete it afterwards."""
+        session_id = f"{role.name}_{uuid.uuid4().hex}"
+        session = await self.session_service.create_session(
+            app_name=role.app_name,
+            user_id=USER_ID,
+            session_id=session_id,
+            state=state or {},
+        )
+        try:
+            yield session
+        finally:
+            await self.session_service.delete_session(
+                app_name=role.app_name,
+                user_id=USER_ID,
+                session_id=session_id,
+            )
+
+    async def run(self, role: AgentRole, content: types.Content, instruction: str) -> str:
+        """Run one request against the role's runner and return the final response text."""
+        runner = self.register(role)
+        final_response_text = NO_RESPONSE_TEXT
+
+        async with self.session(role, {INSTRUCTION_STATE_KEY: instruction}) as session:
+            # Drain the run instead of breaking out of it, so the runner's
+            # generator (and its tracing context) closes in this task
+            with span("agent", role.name):
+                async for event in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=content):
+                    if final_response_text != NO_RESPONSE_TEXT or not event.is_final_response():
+                        continue
+                    if event.content and event.content.parts:
+                        final_response_text = event.content.parts[0].text
+                    elif event.actions and event.actions.escalate:
+                        final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
+        return final_response_text
+
+
+_registry: Optional[AgentRegistry] = None
+
+
+def init_registry(*roles: AgentRole, model_override: Optional[ModelOverride] = None) -> AgentRegistry:
+    """Create the process-wide registry and pre-build runners for the given roles."""
+    global _registry
+    _registry = AgentRegistry(model_override=model_override)
+    for role in roles:
+        _registry.register(role)
+    return _registry
+
+
+def get_registry() -> AgentRegistry:
+    """Return the process-wide registry, creating an empty one if startup did not."""
+    global _registry
+    if _registry is None:
+        _registry = AgentRegistry()
+    return _registry
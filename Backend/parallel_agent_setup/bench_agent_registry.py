@@ -0,0 +1,94 @@
+"""
+Requests/sec of the event summary path with per-call agent construction
+(the previous implementation) versus the shared AgentRegistry.
+
+The model is stubbed, so the numbers measure the setup overhead only.
+
+    python bench_agent_registry.py --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+from google.adk.agents import Agent
+from google.adk.models import BaseLlm, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from agent_registry import AgentRegistry, AgentRole
+
+ROLE = AgentRole(
+    name="event_summary_agent",
+    app_name="parallel_event_pipeline",
+    model="stub-llm",
+    description="Provides summary for user events and creates a report about the event.",
+)
+
+
+class StubLlm(BaseLlm):
+    """Returns a fixed response after an optional delay, without network calls."""
+    model: str = "stub-llm"
+    latency_s: float = 0.0
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="stub summary")]))
+
+
+async def legacy_run(llm: BaseLlm, query: str, prompt: str) -> str:
+    """The per-call construction the summarizer used before the registry."""
+    agent = Agent(name=ROLE.name, model=llm, description=ROLE.description, instruction=prompt)
+    session_service = InMemorySessionService()
+    runner = Runner(agent=agent, app_name=ROLE.app_name, session_service=session_service)
+    await session_service.create_session(app_name=ROLE.app_name, user_id="user_1", session_id="session_001")
+
+    content = types.Content(role='user', parts=[types.Part(text=query)])
+    final_response_text = "Agent did not produce a final response."
+    async for event in runner.run_async(user_id="user_1", session_id="session_001", new_message=content):
+        if event.is_final_response():
+            if event.content and event.content.parts:
+                final_response_text = event.content.parts[0].text
+            break
+    return final_response_text
+
+
+async def registry_run(registry: AgentRegistry, query: str, prompt: str) -> str:
+    content = types.Content(role='user', parts=[types.Part(text=query)])
+    return await registry.run(ROLE, content, prompt)
+
+
+async def measure(call, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await call(f"query {i}", f"system prompt {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int, latency_ms: float):
+    llm = StubLlm(latency_s=latency_ms / 1000)
+    registry = AgentRegistry(model_override=llm)
+    registry.register(ROLE)
+
+    before = await measure(lambda q, p: legacy_run(llm, q, p), requests, concurrency)
+    after = await measure(lambda q, p: registry_run(registry, q, p), requests, concurrency)
+
+    print(f"requests={requests} concurrency={concurrency} stub_latency_ms={latency_ms}")
+    print(f"per-call construction: {before:10.1f} req/s")
+    print(f"shared registry:       {after:10.1f} req/s")
+    print(f"speedup:               {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency_ms))
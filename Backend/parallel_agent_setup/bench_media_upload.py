@@ -0,0 +1,136 @@
+"""
+Request parse time and peak RSS for one media file sent as a JSON int list
+(/event_summary/) versus a multipart file part (/event_summary/upload).
+
+Each path is parsed in its own subprocess so the peak RSS figures do not
+contaminate each other.
+
+    python bench_media_upload.py --size-mb 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BOUNDARY = "metropulse-bench-boundary"
+CHUNK_SIZE = 64 * 1024
+
+
+def build_json_body(payload: bytes) -> bytes:
+    return json.dumps({
+        "event_name": "Standup Comedy Night",
+        "event_description": "Benchmark payload",
+        "event_location": "Indiranagar, Bangalore",
+        "media_file": [{"mimeType": "video/mp4", "bytes": list(payload)}],
+    }).encode()
+
+
+def build_multipart_body(payload: bytes) -> bytes:
+    fields = {
+        "event_name": "Standup Comedy Night",
+        "event_description": "Benchmark payload",
+        "event_location": "Indiranagar, Bangalore",
+    }
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode()
+        )
+    parts.append(
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"media_file\"; filename=\"clip.mp4\"\r\n"
+        f"Content-Type: video/mp4\r\n\r\n".encode()
+    )
+    parts.append(payload)
+    parts.append(f"\r\n--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_json(body: bytes):
+    from main import EventRequest
+    from media_ingest import SpooledMedia
+
+    event = EventRequest.model_validate_json(body)
+    media_files = []
+    for media_detail in event.media_file:
+        media = SpooledMedia.from_ints(media_detail.mimeType, media_detail.bytes)
+        media_files.append({"mime_type": media.mime_type, "data": media._read()})
+    return media_files
+
+
+def parse_multipart(body: bytes):
+    from starlette.requests import Request
+
+    async def run():
+        chunks = [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+
+        async def receive():
+            chunk = chunks.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+        }
+        form = await Request(scope, receive).form()
+        upload = form["media_file"]
+        return [{"mime_type": upload.content_type, "data": await upload.read()}]
+
+    return asyncio.run(run())
+
+
+def child(path: str, body_file: str):
+    with open(body_file, "rb") as f:
+        body = f.read()
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    media_files = parse_json(body) if path == "json" else parse_multipart(body)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({
+        "path": path,
+        "body_mb": len(body) / 2**20,
+        "media_mb": sum(len(m["data"]) for m in media_files) / 2**20,
+        "parse_ms": elapsed_ms,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_growth_mb": peak_rss_mb() - rss_before,
+    }))
+
+
+def main(size_mb: int):
+    payload = os.urandom(size_mb * 2**20)
+    for path, builder in (("json", build_json_body), ("multipart", build_multipart_body)):
+        with tempfile.NamedTemporaryFile(suffix=".body", delete=False) as f:
+            f.write(builder(payload))
+            body_file = f.name
+        try:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", path, body_file],
+                check=True, capture_output=True, text=True,
+            ).stdout
+        finally:
+            os.remove(body_file)
+        result = json.loads(out.strip().splitlines()[-1])
+        print(
+            f"{result['path']:>9}: body {result['body_mb']:7.1f} MB | parse {result['parse_ms']:9.1f} ms | "
+            f"peak RSS {result['peak_rss_mb']:7.1f} MB (+{result['peak_rss_growth_mb']:.1f} MB while parsing)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--child", nargs=2, metavar=("PATH", "BODY_FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+    else:
+        main(args.size_mb)
@@ -37,6 +37,12 @@ gcloud services enable run.googleapis.com artifactregistry.googleapis.com
 # DEPLOYMENT
 # ----------------------------
 
+# The image imports the shared package from the build context; copy it in for this deploy only
+echo "📦 Staging the shared metropulse_common package..."
+rm -rf metropulse_common
+cp -r ../../common/metropulse_common metropulse_common
+trap 'rm -rf metropulse_common' EXIT
+
 echo "🚀 Deploying $SERVICE_NAME to Cloud Run..."
 gcloud run deploy $SERVICE_NAME \
   --source . \
@@ -0,0 +1,37 @@
+"""
+Event summary responders for the offline fake LLM (metropulse_common.fake_llm),
+which stands in for Gemini when LLM_BACKEND=fake.
+"""
+import json
+
+from metropulse_common.fake_llm import FakeLlm, FakeLlmProfile, filler_text
+
+from agent_registry import AgentRole
+
+def event_summary_responder(rng, profile, llm_request) -> str:
+    return "Event report: " + filler_text(rng, profile.text_chars * profile.items)
+
+
+def media_analysis_responder(rng, profile, llm_request) -> str:
+    return "Media findings: " + filler_text(rng, profile.text_chars * profile.items)
+
+
+def overall_summary_responder(rng, profile, llm_request) -> str:
+    return json.dumps({
+        "Location": f"Area {rng.randint(1, 100)}, Bangalore",
+        "Eventtype": rng.choice(["Traffic", "Concert", "Protest", "Weather"]),
+        "Eventname": f"Event {rng.randint(1, 10_000)}",
+        "EventSummary": filler_text(rng, profile.text_chars * 2),
+    })
+
+
+_RESPONDERS = {
+    "event_summary_agent": event_summary_responder,
+    "media_analysis_agent": media_analysis_responder,
+    "overall_summary_agent": overall_summary_responder,
+}
+
+
+def fake_model_for_role(role: AgentRole, profile: FakeLlmProfile = None) -> FakeLlm:
+    """A FakeLlm answering like the given role, under the role's model name."""
+    return FakeLlm(model=role.model, responder=_RESPONDERS[role.name], profile=profile or FakeLlmProfile())
@@ -1,19 +1,82 @@
 from typing import List
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, Form, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
+import asyncio
 import json
-from google.cloud import firestore
 from datetime import datetime
+import logging
+import os
+import time
 
-from media_summary_agent import analyze_media_files
-from overall_summary import get_overall_summary
-from event_summary_agent import get_event_summary
+from media_summary_agent import analyze_media_files, MEDIA_ANALYSIS_ROLE
+from overall_summary import get_overall_summary, OVERALL_SUMMARY_ROLE
+from event_summary_agent import get_event_summary, EVENT_SUMMARY_ROLE
 from prompts import event_summary_prompt, merge_summary, media_prompts
+from agent_registry import init_registry
+from utils import get_mime_type
+from stage_graph import Stage, StageGraph, StageTimeoutError, server_timing_header
+from media_ingest import (
+    SpooledMedia, MediaBudgetTimeout, MediaTooLargeError, media_budget, materialize_media, close_media,
+)
+from media_preprocess import PREPROCESS_SIGNATURE, preprocess_media, shutdown_pool
+from media_cache import MEDIA_CACHE_ENABLED, media_analysis_cache, media_cache_key
+from agent_registry import NO_RESPONSE_TEXT, wrap_models
+from summary_store import create_summary_writer
+from fake_llm import fake_model_for_role
+from metropulse_common.fake_llm import LLM_BACKEND
+from metropulse_common.cassette import CASSETTE_MODE, cassette_wrapper
+from metropulse_common.model_limiter import MODEL_LIMITER_ENABLED, ModelLimiter, ModelOverloadedError, rate_limited_wrapper
+from metropulse_common.resilience import (
+    MALFORMED, RESILIENCE_ENABLED, TRANSIENT, CircuitOpenError, classify, resilience_stats, resilient_wrapper,
+    run_with_retry,
+)
+from metropulse_common.telemetry import STAGE_SECONDS, configure_service, configure_tracing, observe_request_usage, render_metrics, shutdown_tracing, span
+from metropulse_common.token_usage import RequestUsage, track_request, usage_totals
+
+# Per-stage timeouts for /event_summary/, in seconds
+EVENT_STAGE_TIMEOUT_S = float(os.getenv("EVENT_STAGE_TIMEOUT_S", "60"))
+MEDIA_STAGE_TIMEOUT_S = float(os.getenv("MEDIA_STAGE_TIMEOUT_S", "120"))
+MERGE_STAGE_TIMEOUT_S = float(os.getenv("MERGE_STAGE_TIMEOUT_S", "60"))
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/event_summary.jsonl.gz")
+
+# The shared modules (metropulse_common) report through logging
+logging.basicConfig(level=logging.INFO)
+configure_service("event_summary", "event-summary")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_tracing()
+    # Build one runner per agent role up front instead of per request
+    model_override = None
+    if LLM_BACKEND == "fake":
+        print("LLM_BACKEND=fake: all model calls are served by the offline fake LLM.")
+        model_override = fake_model_for_role
+    if CASSETTE_MODE in ("record", "replay"):
+        model_override = wrap_models(model_override, cassette_wrapper(CASSETTE_PATH))
+    # Around the fake or cassette, so every model call (fake, replayed or real) waits for a slot
+    model_limiter = ModelLimiter()
+    if MODEL_LIMITER_ENABLED:
+        model_override = wrap_models(model_override, rate_limited_wrapper(model_limiter))
+    app.state.model_limiter = model_limiter
+    if RESILIENCE_ENABLED:
+        model_override = wrap_models(model_override, resilient_wrapper())
+    init_registry(EVENT_SUMMARY_ROLE, MEDIA_ANALYSIS_ROLE, OVERALL_SUMMARY_ROLE, model_override=model_override)
+    summary_writer = create_summary_writer()
+    if summary_writer is not None:
+        summary_writer.start()
+    app.state.summary_writer = summary_writer
+    yield
+    # Flush queued summaries before the process exits
+    if summary_writer is not None:
+        await summary_writer.stop()
+    shutdown_pool()
+    shutdown_tracing()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware for local frontend access
 app.add_middleware(
@@ -24,6 +87,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await call_next(request)
+        outcome = str(response.status_code)
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the series count bounded
+        route = request.scope.get("route")
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="http",
+                              name=f"{request.method} {route.path if route else 'unmatched'}", outcome=outcome)
+
 class MediaFileDetail(BaseModel):
     mimeType: str
     bytes: List[int] = []
@@ -46,68 +123,205 @@ class EventSumary(BaseModel):
 async def root():
     return {"status": "OK", "message": "FastAPI event summarizer is running."}
 
-# async def upload_summary_to_firestore(summary: EventSumary):
-#     db = firestore.Client()
-#     doc_ref = db.collection("event_summary").document()  # auto ID
-#     doc_ref.set({
-#         "Location": summary.Location,
-#         "Eventtype": summary.Eventtype,
-#         "Eventname": summary.Eventname,
-#         "EventSummary": summary.EventSummary,
-#         # "created_at": datetime.utcnow().isoformat()
-#     })
+def store_summary(summary: EventSumary):
+    """Queue the summary for a batched Firestore write; never waits on Firestore."""
+    summary_writer = getattr(app.state, "summary_writer", None)
+    if summary_writer is not None:
+        summary_writer.enqueue({**summary.dict(), "created_at": datetime.utcnow()})
 
-# Event summary endpoint
-@app.post("/event_summary/")
-async def summarize_event(event: EventRequest):
+async def run_event_summary(event_name: str, event_description: str, event_location: str, media_files: List[SpooledMedia]):
+    """Shared pipeline for the JSON and multipart event summary endpoints."""
+    with track_request() as request_usage:
+        response = await _run_event_summary(event_name, event_description, event_location, media_files, request_usage)
+    usage_totals.record_request(" ".join(event_location.lower().split()), request_usage)
+    observe_request_usage(request_usage)
+    print(f"Token usage: {request_usage.to_dict()}")
+    if isinstance(response, JSONResponse):
+        response.headers["X-Token-Usage"] = str(request_usage.total.total_tokens)
+    return response
+
+async def _run_event_summary(event_name: str, event_description: str, event_location: str,
+                             media_files: List[SpooledMedia], request_usage: RequestUsage):
+    merge_attempts = 0
     try:
+        # Refuse up front, rather than part-way through, when model calls are backed up
+        if MODEL_LIMITER_ENABLED:
+            app.state.model_limiter.check_admission()
+
         # Prepare prompts
         event_system_prompt, event_user_prompt = event_summary_prompt(
-            event.event_name, event.event_description, event.event_location,
+            event_name, event_description, event_location,
         )
         
-        media_file = event.media_file
-        # Get event summary (awaited)
-        event_summary_result = await get_event_summary(event_user_prompt, event_system_prompt)
-
-        # Merge with empty media summary
         media_system_pompt, analysis_media_prompt = media_prompts()
-        media_summary_result = "No media files provided."
-        if media_file:
-            media_summary_result = await analyze_media_files(media_file, media_system_pompt, analysis_media_prompt)
-        print(media_summary_result)
+        media_report = {}
 
-        merger_system_prompt, merger_user_prompt = merge_summary(
-            event_summary_result, media_summary_result
-        )
+        async def event_stage():
+            return await get_event_summary(event_user_prompt, event_system_prompt)
 
-        # Get final summary (awaited)
-        merger_summary_result = await get_overall_summary(
-            merger_user_prompt, merger_system_prompt
-        )
+        async def media_stage():
+            if not media_files:
+                return "No media files provided."
+            # Media stays spooled until the budget admits it into memory
+            async with media_budget.reserve(sum(media.size for media in media_files)):
+                with span("media_load", "media", files=len(media_files)):
+                    loaded_media = await materialize_media(media_files)
 
-        # Try to parse as JSON
-        try:
-            summary_json = EventSumary(**merger_summary_result)
-            return JSONResponse(
-            status_code=200,
-            content={"message": "Summary prepared", "data": summary_json.dict()}
-            )
-
-        except json.JSONDecodeError:
-            # Retry once
-            retry_output = await get_overall_summary(merger_user_prompt, merger_system_prompt)
-            try:
-                summary_json_retry = EventSumary(**retry_output)
-                return summary_json_retry
-            except json.JSONDecodeError:
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "error": "Final merged summary is not valid JSON even after retry.",
-                        "raw_output": retry_output,
-                    },
+                cache_key = None
+                if MEDIA_CACHE_ENABLED:
+                    # Keyed on the raw uploads, so a hit skips pre-processing as well
+                    cache_key = media_cache_key(
+                        loaded_media, MEDIA_ANALYSIS_ROLE.model, PREPROCESS_SIGNATURE,
+                        media_system_pompt, analysis_media_prompt,
+                    )
+                    try:
+                        cached_summary = await media_analysis_cache.get(cache_key)
+                    except Exception as e:
+                        # The cache only saves work, a broken one must not fail the request
+                        print(f"Media cache lookup failed, analyzing anyway: {e}")
+                        cached_summary = None
+                    if cached_summary is not None:
+                        media_report["cache"] = "hit"
+                        return cached_summary
+                    media_report["cache"] = "miss"
+
+                with span("media_preprocess", "media", files=len(media_files)):
+                    loaded_media, preprocess_stats = await preprocess_media(loaded_media)
+                media_report.update(preprocess_stats)
+                print(f"Media pre-processing: {preprocess_stats}")
+
+                media_summary = await analyze_media_files(
+                    loaded_media, media_system_pompt, analysis_media_prompt, media_report,
                 )
+                # A summary missing failed batches would stick in the cache, only keep complete ones
+                complete = not media_report.get("failed_batches")
+                if (cache_key is not None and complete and media_summary != NO_RESPONSE_TEXT
+                        and not media_summary.startswith("Agent escalated")):
+                    try:
+                        await media_analysis_cache.set(cache_key, media_summary)
+                    except Exception as e:
+                        print(f"Media cache write failed: {e}")
+                return media_summary
+
+        async def merge_stage(event, media):
+            merger_system_prompt, merger_user_prompt = merge_summary(event, media)
 
+            async def merge_once():
+                nonlocal merge_attempts
+                merge_attempts += 1
+                return EventSumary.model_validate(await get_overall_summary(merger_user_prompt, merger_system_prompt))
+
+            # Transient model errors are retried inside the model; here the
+            # whole merge is re-asked when its answer is not a valid summary
+            return await run_with_retry("merge", merge_once, retry_on=(MALFORMED,))
+
+        # Event text and media analysis are independent, only the merge needs both
+        graph = StageGraph([
+            Stage("event", event_stage, timeout=EVENT_STAGE_TIMEOUT_S),
+            Stage("media", media_stage, timeout=MEDIA_STAGE_TIMEOUT_S),
+            Stage("merge", merge_stage, deps=("event", "media"), timeout=MERGE_STAGE_TIMEOUT_S),
+        ])
+        results, timings = await graph.run()
+        print(results["media"])
+        print(f"Stage timings (ms): {timings}")
+        timing_headers = {"Server-Timing": server_timing_header(timings)}
+        if "bytes_saved" in media_report:
+            timing_headers["X-Media-Bytes-Saved"] = str(media_report["bytes_saved"])
+        if "cache" in media_report:
+            timing_headers["X-Media-Cache"] = media_report["cache"]
+
+        summary_json = results["merge"]
+        store_summary(summary_json)
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Summary prepared", "data": summary_json.dict()},
+            headers=timing_headers,
+        )
+
+    except (json.JSONDecodeError, ValidationError) as e:
+        if merge_attempts:
+            error = f"Final merged summary is not valid JSON after {merge_attempts} attempt(s)."
+        else:
+            error = "Agent response is not valid JSON."
+        return JSONResponse(status_code=500, content={"error": error, "detail": str(e)})
+    except StageTimeoutError as e:
+        return JSONResponse(status_code=504, content={"error": str(e), "stage": e.stage})
+    except ModelOverloadedError as e:
+        return JSONResponse(
+            status_code=429,
+            content={"error": f"Model capacity exhausted: {e}"},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except CircuitOpenError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": f"Model temporarily unavailable: {e}"},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except MediaTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except MediaBudgetTimeout as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(e)},
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
\ No newline at end of file
+        if classify(e) == TRANSIENT:
+            return JSONResponse(status_code=503, content={"error": f"Model temporarily unavailable: {e}"})
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        close_media(media_files)
+
+# Event summary endpoint
+@app.post("/event_summary/")
+async def summarize_event(event: EventRequest):
+    media_files = []
+    try:
+        for media_detail in event.media_file:
+            # Spooled off the event loop, straight from the int list
+            media_files.append(await asyncio.to_thread(SpooledMedia.from_ints, media_detail.mimeType, media_detail.bytes))
+            # Drop each int list as soon as its bytes are spooled
+            media_detail.bytes = []
+    except (ValueError, TypeError) as e:
+        close_media(media_files)
+        return JSONResponse(status_code=400, content={"error": f"Invalid media bytes: {e}"})
+    event.media_file = []
+
+    return await run_event_summary(
+        event.event_name, event.event_description, event.event_location, media_files,
+    )
+
+# Event summary endpoint with media sent as multipart/form-data file parts
+@app.post("/event_summary/upload")
+async def summarize_event_upload(
+    event_name: str = Form(...),
+    event_description: str = Form(...),
+    event_location: str = Form(...),
+    media_file: List[UploadFile] = File(default=[]),
+):
+    # The raw bytes go straight into the Blob parts, no int list in between
+    media_files = [
+        SpooledMedia.from_upload(upload, upload.content_type or get_mime_type(upload.filename or ""))
+        for upload in media_file
+    ]
+
+    return await run_event_summary(event_name, event_description, event_location, media_files)
+
+# Prometheus histograms of per-stage durations
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Runtime diagnostics
+@app.get("/debug")
+async def debug():
+    summary_writer = getattr(app.state, "summary_writer", None)
+    return {
+        "media": media_budget.stats(),
+        "media_cache": media_analysis_cache.stats(),
+        "summary_store": summary_writer.stats() if summary_writer is not None else None,
+        "token_usage": usage_totals.stats(),
+        "model_limiter": {"enabled": MODEL_LIMITER_ENABLED, **app.state.model_limiter.stats()},
+        "resilience": resilience_stats(),
+    }
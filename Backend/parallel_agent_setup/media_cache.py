@@ -0,0 +1,168 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+MEDIA_CACHE_ENABLED = os.getenv("MEDIA_CACHE_ENABLED", "true").lower() == "true"
+# Size limits for the in-memory and on-disk tiers, in bytes of cached text
+MEDIA_CACHE_MEMORY_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MEMORY_MAX_BYTES", str(16 * 1024 * 1024)))
+MEDIA_CACHE_DISK_MAX_BYTES = int(os.getenv("MEDIA_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(os.getcwd(), "media_cache"))
+
+
+def media_cache_key(media_files: List[Dict], *prompt_parts: str) -> str:
+    """
+    Content hash of the uploaded media set plus the prompt version.
+
+    Computed on the raw uploads, before pre-processing, so a hit skips that
+    too; callers include the pre-processing settings in `prompt_parts`.
+    Items are hashed individually and sorted, so the same attachments in a
+    different order share one entry.
+    """
+    item_digests = sorted(
+        hashlib.sha256(item['mime_type'].encode() + b"\0" + item['data']).hexdigest()
+        for item in media_files
+    )
+    prompt_version = hashlib.sha256("\0".join(prompt_parts).encode()).hexdigest()
+    return hashlib.sha256(f"{prompt_version}:{','.join(item_digests)}".encode()).hexdigest()
+
+
+class MediaAnalysisCache:
+    """Two-tier (memory LRU + local disk) cache of media analysis text, keyed by content hash."""
+
+    def __init__(self, memory_max_bytes: int, disk_max_bytes: int, directory: str):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.directory = directory
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> size of the files on disk, least recently used first; loaded on first use
+        self._disk_index: "Optional[OrderedDict[str, int]]" = None
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def _remember(self, key: str, value: str):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # recency survives a restart through the mtime
+        except OSError:
+            pass  # evicted meanwhile; the value read is still good
+        return value
+
+    def _write_disk(self, key: str, value: str) -> int:
+        """Write atomically through a temp file of this writer's own; returns the bytes written."""
+        os.makedirs(self.directory, exist_ok=True)
+        data = value.encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        return len(data)
+
+    def _scan_disk(self) -> "OrderedDict[str, int]":
+        """Entries already on disk, oldest first; read once, then tracked in memory."""
+        entries = []
+        with contextlib.suppress(FileNotFoundError):
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".txt"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.name[:-len(".txt")], stat.st_size))
+        return OrderedDict((key, size) for _, key, size in sorted(entries))
+
+    def _remove_disk(self, keys: List[str]):
+        for key in keys:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path(key))
+
+    async def _disk_entries(self) -> "OrderedDict[str, int]":
+        if self._disk_index is None:
+            index = await asyncio.to_thread(self._scan_disk)
+            if self._disk_index is None:
+                self._disk_index = index
+                self._disk_bytes = sum(index.values())
+        return self._disk_index
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value
+
+        value = await asyncio.to_thread(self._read_disk, key)
+        if value is not None:
+            self.disk_hits += 1
+            self._remember(key, value)
+            if self._disk_index is not None and key in self._disk_index:
+                self._disk_index.move_to_end(key)
+            return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self._remember(key, value)
+        size = await asyncio.to_thread(self._write_disk, key, value)
+        # The index and its byte count live on the event loop, so eviction
+        # never lists the directory and concurrent sets cannot corrupt them
+        index = await self._disk_entries()
+        self._disk_bytes += size - index.pop(key, 0)
+        index[key] = size
+        evicted = []
+        while self._disk_bytes > self.disk_max_bytes and len(index) > 1:
+            old_key, old_size = index.popitem(last=False)
+            self._disk_bytes -= old_size
+            evicted.append(old_key)
+        if evicted:
+            self.evictions += len(evicted)
+            await asyncio.to_thread(self._remove_disk, evicted)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk_index) if self._disk_index is not None else None,
+            "disk_bytes": self._disk_bytes,
+        }
+
+
+media_analysis_cache = MediaAnalysisCache(MEDIA_CACHE_MEMORY_MAX_BYTES, MEDIA_CACHE_DISK_MAX_BYTES, MEDIA_CACHE_DIR)
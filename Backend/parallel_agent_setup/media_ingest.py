@@ -0,0 +1,142 @@
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import IO, List, Optional, Sequence
+
+# Payloads above this size are spooled to a temporary file instead of RAM
+MEDIA_SPOOL_THRESHOLD_BYTES = int(os.getenv("MEDIA_SPOOL_THRESHOLD_BYTES", str(1024 * 1024)))
+# Process-wide limit on media bytes materialized in memory at the same time
+MEDIA_BYTES_BUDGET = int(os.getenv("MEDIA_BYTES_BUDGET", str(256 * 1024 * 1024)))
+# How long a request may queue for budget before it is turned away
+MEDIA_BUDGET_WAIT_S = float(os.getenv("MEDIA_BUDGET_WAIT_S", "30"))
+MEDIA_SPOOL_DIR = os.getenv("MEDIA_SPOOL_DIR") or None
+# Byte values converted and written per step when spooling a JSON int list
+MEDIA_SPOOL_CHUNK = 256 * 1024
+
+
+class MediaTooLargeError(Exception):
+    """The request's media can never fit in the configured budget."""
+
+
+class MediaBudgetTimeout(Exception):
+    """The request waited too long for in-flight media budget."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too much media is being processed right now, retry later.")
+        self.retry_after = retry_after
+
+
+class SpooledMedia:
+    """A media payload kept in a spooled temp file until the model call needs it."""
+
+    def __init__(self, mime_type: str, file: IO[bytes], size: int):
+        self.mime_type = mime_type
+        self.file = file
+        self.size = size
+
+    @classmethod
+    def from_ints(cls, mime_type: str, values: Sequence[int]) -> "SpooledMedia":
+        """
+        Spool a JSON list of byte values chunk by chunk, so no bytes copy of
+        the whole payload is built. Blocking: run it with asyncio.to_thread.
+        Raises ValueError for values outside 0..255.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_THRESHOLD_BYTES, dir=MEDIA_SPOOL_DIR)
+        try:
+            items = iter(values)
+            while chunk := bytes(islice(items, MEDIA_SPOOL_CHUNK)):
+                spool.write(chunk)
+        except (ValueError, TypeError):
+            spool.close()
+            raise
+        return cls(mime_type, spool, len(values))
+
+    @classmethod
+    def from_upload(cls, upload, mime_type: str) -> "SpooledMedia":
+        # Starlette already spools multipart file parts to disk, reuse its file
+        file = upload.file
+        size = upload.size
+        if size is None:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+        return cls(mime_type, file, size)
+
+    def _read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    async def read(self) -> bytes:
+        return await asyncio.to_thread(self._read)
+
+    def close(self):
+        self.file.close()
+
+
+class MediaBudget:
+    """Admits requests while their media fits the byte budget, queues the rest."""
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.in_flight_bytes = 0
+        self.in_flight_requests = 0
+        self.waiting_requests = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int, timeout: Optional[float] = MEDIA_BUDGET_WAIT_S):
+        if nbytes > self.budget_bytes:
+            self.rejected_total += 1
+            raise MediaTooLargeError(
+                f"Media totals {nbytes} bytes, above the {self.budget_bytes} byte budget."
+            )
+
+        async with self._cond:
+            self.waiting_requests += 1
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self.in_flight_bytes + nbytes <= self.budget_bytes),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                self.rejected_total += 1
+                raise MediaBudgetTimeout(retry_after=max(1, int(timeout or 1)))
+            finally:
+                self.waiting_requests -= 1
+            self.in_flight_bytes += nbytes
+            self.in_flight_requests += 1
+            self.admitted_total += 1
+
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight_bytes -= nbytes
+                self.in_flight_requests -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "in_flight_bytes": self.in_flight_bytes,
+            "in_flight_requests": self.in_flight_requests,
+            "waiting_requests": self.waiting_requests,
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+media_budget = MediaBudget(MEDIA_BYTES_BUDGET)
+
+
+async def materialize_media(spooled: List[SpooledMedia]) -> list:
+    """Load spooled media into the dict format create_media_content expects."""
+    return [{'mime_type': media.mime_type, 'data': await media.read()} for media in spooled]
+
+
+def close_media(spooled: List[SpooledMedia]):
+    for media in spooled:
+        media.close()
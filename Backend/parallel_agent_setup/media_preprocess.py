@@ -0,0 +1,175 @@
+import asyncio
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # pre-processing is skipped without Pillow
+    Image = None
+
+try:
+    import cv2
+except ImportError:  # videos are sent untouched without OpenCV
+    cv2 = None
+
+MEDIA_PREPROCESS_ENABLED = os.getenv("MEDIA_PREPROCESS_ENABLED", "true").lower() == "true"
+# Longest image edge, in pixels, after downscaling
+MEDIA_IMAGE_MAX_EDGE = int(os.getenv("MEDIA_IMAGE_MAX_EDGE", "1024"))
+MEDIA_IMAGE_QUALITY = int(os.getenv("MEDIA_IMAGE_QUALITY", "80"))
+# Upper bound on frames kept per video
+MEDIA_VIDEO_MAX_FRAMES = int(os.getenv("MEDIA_VIDEO_MAX_FRAMES", "8"))
+# Max Hamming distance between 64-bit dHashes for two images to count as duplicates
+MEDIA_DEDUP_MAX_DISTANCE = int(os.getenv("MEDIA_DEDUP_MAX_DISTANCE", "6"))
+MEDIA_PREPROCESS_WORKERS = int(os.getenv("MEDIA_PREPROCESS_WORKERS", str(os.cpu_count() or 1)))
+# Everything that changes what the model is shown for the same upload, for cache keys
+PREPROCESS_SIGNATURE = (
+    f"preprocess={MEDIA_PREPROCESS_ENABLED}:pil={Image is not None}:cv2={cv2 is not None}:"
+    f"edge={MEDIA_IMAGE_MAX_EDGE}:q={MEDIA_IMAGE_QUALITY}:frames={MEDIA_VIDEO_MAX_FRAMES}:"
+    f"dedup={MEDIA_DEDUP_MAX_DISTANCE}"
+)
+
+# (mime_type, data, perceptual hash or None)
+ProcessedItem = Tuple[str, bytes, Optional[int]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _dhash(image) -> int:
+    """64-bit difference hash: one bit per horizontal gradient of a 9x8 grayscale thumbnail."""
+    small = image.convert("L").resize((9, 8))
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _is_duplicate(phash: int, seen: List[int]) -> bool:
+    return any(_hamming(phash, other) <= MEDIA_DEDUP_MAX_DISTANCE for other in seen)
+
+
+def _encode_image(image) -> Tuple[bytes, int]:
+    image = image.convert("RGB")
+    image.thumbnail((MEDIA_IMAGE_MAX_EDGE, MEDIA_IMAGE_MAX_EDGE))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=MEDIA_IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue(), _dhash(image)
+
+
+def _process_image(mime_type: str, data: bytes) -> List[ProcessedItem]:
+    try:
+        encoded, phash = _encode_image(Image.open(io.BytesIO(data)))
+    except Exception:
+        return [(mime_type, data, None)]
+    # Keep the original when it was already smaller than the re-encode
+    if len(encoded) >= len(data):
+        return [(mime_type, data, phash)]
+    return [("image/jpeg", encoded, phash)]
+
+
+def _process_video(mime_type: str, data: bytes) -> List[ProcessedItem]:
+    # OpenCV only reads from a path, so the clip goes through a temp file
+    with tempfile.NamedTemporaryFile(suffix=".video") as tmp:
+        tmp.write(data)
+        tmp.flush()
+        capture = cv2.VideoCapture(tmp.name)
+        try:
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            if frame_count <= 0:
+                return [(mime_type, data, None)]
+
+            # Oversample evenly, then drop near-identical frames
+            candidates = min(frame_count, MEDIA_VIDEO_MAX_FRAMES * 3)
+            indices = sorted({int(i * frame_count / candidates) for i in range(candidates)})
+            frames: List[ProcessedItem] = []
+            seen: List[int] = []
+            for index in indices:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ok, frame = capture.read()
+                if not ok:
+                    continue
+                image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                encoded, phash = _encode_image(image)
+                if _is_duplicate(phash, seen):
+                    continue
+                seen.append(phash)
+                frames.append(("image/jpeg", encoded, phash))
+        finally:
+            capture.release()
+
+    if not frames:
+        return [(mime_type, data, None)]
+    if len(frames) > MEDIA_VIDEO_MAX_FRAMES:
+        step = len(frames) / MEDIA_VIDEO_MAX_FRAMES
+        frames = [frames[int(i * step)] for i in range(MEDIA_VIDEO_MAX_FRAMES)]
+    return frames
+
+
+def _process_item(mime_type: str, data: bytes) -> List[ProcessedItem]:
+    """Runs in a worker process: shrink one media item into model-ready parts."""
+    if Image is not None and mime_type.startswith("image/"):
+        return _process_image(mime_type, data)
+    if Image is not None and cv2 is not None and mime_type.startswith("video/"):
+        return _process_video(mime_type, data)
+    return [(mime_type, data, None)]
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MEDIA_PREPROCESS_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def preprocess_media(media_files: List[Dict]) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Downscale images, sample video keyframes and drop near-duplicates across
+    the whole media set, off the event loop.
+
+    Returns the processed media dicts and a report with the bytes saved.
+    """
+    bytes_in = sum(len(item['data']) for item in media_files)
+    stats = {"bytes_in": bytes_in, "bytes_out": bytes_in, "bytes_saved": 0, "parts_in": len(media_files),
+             "parts_out": len(media_files), "duplicates_dropped": 0}
+    if not MEDIA_PREPROCESS_ENABLED or not media_files:
+        return media_files, stats
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, _process_item, item['mime_type'], item['data'])
+        for item in media_files
+    ))
+
+    processed = []
+    seen: List[int] = []
+    for parts in results:
+        for mime_type, data, phash in parts:
+            if phash is not None:
+                if _is_duplicate(phash, seen):
+                    stats["duplicates_dropped"] += 1
+                    continue
+                seen.append(phash)
+            processed.append({'mime_type': mime_type, 'data': data})
+
+    stats["bytes_out"] = sum(len(item['data']) for item in processed)
+    stats["bytes_saved"] = bytes_in - stats["bytes_out"]
+    stats["parts_out"] = len(processed)
+    return processed, stats
@@ -2,126 +2,105 @@ import os
 import asyncio
 import warnings
 from dotenv import load_dotenv
-from google.adk.agents import Agent
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.adk.tools import google_search
 from google.genai import types
-import mimetypes
-from typing import List, Dict, Union
+from typing import List, Dict, Optional
 from prompts import media_prompts
-from utils import get_media_type, get_mime_type, read_file_as_bytes, create_media_content
+from utils import build_media_content, load_media_files
+from agent_registry import AgentRole, NO_RESPONSE_TEXT, get_registry
 
 load_dotenv()
 warnings.filterwarnings("ignore")
 
 AGENT_MODEL = "gemini-2.0-flash-exp"
 APP_NAME = "media_summary_agent"
-USER_ID = "user_1"
-SESSION_ID = "session_001"
 
-def convert_media_file_details_to_media_files(media_file_details) -> List[Dict[str, Union[str, bytes]]]:
-    """
-    Convert MediaFileDetail objects to the format expected by create_media_content
-    
-    Args:
-        media_file_details: List of MediaFileDetail objects from FastAPI request
-        
-    Returns:
-        List of dictionaries with 'mime_type' and 'data' keys
-    """
-    converted_files = []
-    
-    for media_detail in media_file_details:
-        # Convert list of integers back to bytes
-        file_bytes = bytes(media_detail.bytes)
-        
-        converted_file = {
-            'mime_type': media_detail.mimeType,
-            'data': file_bytes
-        }
-        converted_files.append(converted_file)
-    
-    return converted_files
-
-def create_media_content(media_files: List[Union[str, Dict[str, Union[str, bytes]]]], analysis_prompt: str) -> types.Content:
-    """Create content with media files and analysis prompt"""
-    parts = [types.Part(text=analysis_prompt)]
-
-    for item in media_files:
-        # Case 1: item is already a dict with mime_type and data
-        if isinstance(item, dict) and 'mime_type' in item and 'data' in item:
-            parts.append(types.Part(inline_data=types.Blob(
-                mime_type=item['mime_type'],
-                data=item['data']
-            )))
-        # Case 2: item is a file path string
-        elif isinstance(item, str): 
-            if not os.path.exists(item):
-                print(f"Warning: File {item} not found, skipping...")
-                continue
-
-            mime_type = get_mime_type(item)
-            file_data = read_file_as_bytes(item)
-
-            parts.append(types.Part(inline_data=types.Blob(
-                mime_type=mime_type,
-                data=file_data
-            )))
-        else:
-            print(f"Warning: Unsupported media item format: {item}")
+# Attachment sets above these limits are analyzed in concurrent batches
+MEDIA_BATCH_MAX_ITEMS = int(os.getenv("MEDIA_BATCH_MAX_ITEMS", "4"))
+MEDIA_BATCH_MAX_BYTES = int(os.getenv("MEDIA_BATCH_MAX_BYTES", str(15 * 1024 * 1024)))
+MEDIA_BATCH_CONCURRENCY = int(os.getenv("MEDIA_BATCH_CONCURRENCY", "3"))
 
-    return types.Content(role='user', parts=parts)
+MEDIA_ANALYSIS_ROLE = AgentRole(
+    name="media_analysis_agent",
+    app_name=APP_NAME,
+    model=AGENT_MODEL,
+    description="Expert agent for analyzing images and videos to extract comprehensive event information and provide detailed summaries.",
+)
 
-async def analyze_media_async(media_files: list, system_prompt: str, analysis_prompt: str) -> str:
-    """Analyze media files using Google ADK without function tools"""
-    
-    # Convert MediaFileDetail objects to expected format if needed
-    if media_files and hasattr(media_files[0], 'mimeType') and hasattr(media_files[0], 'bytes'):
-        # This is a list of MediaFileDetail objects, convert them
-        converted_media_files = convert_media_file_details_to_media_files(media_files)
-    else:
-        # This is already in the expected format (file paths or dicts)
-        converted_media_files = media_files
-
-    media_agent = Agent(
-        name="media_analysis_agent",
-        model=AGENT_MODEL,
-        description="Expert agent for analyzing images and videos to extract comprehensive event information and provide detailed summaries.",
-        instruction=system_prompt,
-        tools=[google_search] if system_prompt and "search" in system_prompt.lower() else [],
-    )
-
-    session_service = InMemorySessionService()
+async def analyze_media_async(media_files: list, system_prompt: str, analysis_prompt: str,
+                              report: Optional[dict] = None) -> str:
+    """
+    Analyze media files using Google ADK without function tools. `report`,
+    if given, gets the batch count and how many batches failed.
+    """
+    # File paths are read off the event loop before any content is built
+    converted_media_files = await load_media_files(media_files)
 
-    runner = Runner(
-        agent=media_agent,
-        app_name=APP_NAME,
-        session_service=session_service
-    )
+    batches = split_media_batches(converted_media_files, MEDIA_BATCH_MAX_ITEMS, MEDIA_BATCH_MAX_BYTES)
+    if len(batches) <= 1:
+        content = await build_media_content(converted_media_files, analysis_prompt)
+        return await get_registry().run(MEDIA_ANALYSIS_ROLE, content, system_prompt)
 
-    await session_service.create_session(
-        app_name=APP_NAME,
-        user_id=USER_ID,
-        session_id=SESSION_ID
-    )
+    # Map: analyze bounded batches concurrently
+    semaphore = asyncio.Semaphore(MEDIA_BATCH_CONCURRENCY)
 
-    content = create_media_content(converted_media_files, analysis_prompt)
-    final_response_text = "Agent did not produce a final response."
+    async def analyze_batch(batch: list) -> str:
+        async with semaphore:
+            content = await build_media_content(batch, analysis_prompt)
+            return await get_registry().run(MEDIA_ANALYSIS_ROLE, content, system_prompt)
 
-    async for event in runner.run_async(user_id=USER_ID, session_id=SESSION_ID, new_message=content):
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                final_response_text = event.content.parts[0].text
-            elif event.actions and event.actions.escalate:
-                final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
-            break
+    batch_results = await asyncio.gather(*(analyze_batch(batch) for batch in batches), return_exceptions=True)
+    return reduce_media_findings(batches, batch_results, report)
 
-    return final_response_text
+def _media_item_size(item) -> int:
+    if isinstance(item, dict):
+        return len(item.get('data') or b'')
+    return 0
 
-async def analyze_media_files(media_files: list, system_prompt: str, analysis_prompt: str):
+def split_media_batches(media_files: list, max_items: int, max_bytes: int) -> List[list]:
+    """Group attachments in order into batches bounded by item count and total bytes."""
+    batches, current, current_bytes = [], [], 0
+    for item in media_files:
+        size = _media_item_size(item)
+        if current and (len(current) >= max_items or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(item)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+def reduce_media_findings(batches: List[list], batch_results: list, report: Optional[dict] = None) -> str:
+    """
+    Merge per-batch findings into the single media summary merge_summary
+    expects. This is plain text assembly, no extra model call. Batches that
+    failed or produced nothing are skipped and counted in `report`.
+    """
+    sections, first = [], 1
+    for batch, result in zip(batches, batch_results):
+        last = first + len(batch) - 1
+        if isinstance(result, BaseException):
+            print(f"Warning: media batch {first}-{last} failed: {result}")
+        elif result == NO_RESPONSE_TEXT or result.startswith("Agent escalated"):
+            print(f"Warning: media batch {first}-{last} produced no analysis")
+        else:
+            sections.append(f"Findings from attachments {first}-{last} of {sum(map(len, batches))}:\n{result.strip()}")
+        first = last + 1
+
+    if report is not None:
+        report["batches"] = len(batches)
+        report["failed_batches"] = len(batches) - len(sections)
+    if not sections:
+        errors = [result for result in batch_results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        return NO_RESPONSE_TEXT
+    return "\n\n".join(sections)
+
+async def analyze_media_files(media_files: list, system_prompt: str, analysis_prompt: str,
+                              report: Optional[dict] = None):
     """Sync wrapper for media analysis"""
-    response = await analyze_media_async(media_files, system_prompt, analysis_prompt)
+    response = await analyze_media_async(media_files, system_prompt, analysis_prompt, report)
     # print("="*60)
     # print(response)
     return response
\ No newline at end of file
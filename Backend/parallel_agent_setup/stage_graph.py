@@ -0,0 +1,94 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metropulse_common.telemetry import span
+
+
+class StageTimeoutError(Exception):
+    """Raised when a stage does not finish within its own timeout."""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' timed out after {timeout:.1f}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+@dataclass
+class Stage:
+    """
+    One step of a request pipeline.
+
+    `func` is awaited with the results of its dependencies passed as keyword
+    arguments named after those stages.
+    """
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    deps: Tuple[str, ...] = field(default_factory=tuple)
+    timeout: Optional[float] = None
+
+
+class StageGraph:
+    """Runs stages as soon as their dependencies finish, independent ones concurrently."""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        self._order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage graph has a cycle through '{name}'")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage dependency '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Run every stage and return (results, per-stage durations in ms)."""
+        tasks: Dict[str, asyncio.Task] = {}
+        timings: Dict[str, float] = {}
+
+        async def run_stage(stage: Stage):
+            inputs = {dep: await tasks[dep] for dep in stage.deps}
+            start = time.perf_counter()
+            try:
+                with span("stage", stage.name):
+                    if stage.timeout is None:
+                        return await stage.func(**inputs)
+                    return await asyncio.wait_for(stage.func(**inputs), timeout=stage.timeout)
+            except asyncio.TimeoutError:
+                raise StageTimeoutError(stage.name, stage.timeout)
+            finally:
+                timings[stage.name] = (time.perf_counter() - start) * 1000
+
+        for name in self._order:
+            tasks[name] = asyncio.create_task(run_stage(self.stages[name]))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}, timings
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format stage durations as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
@@ -0,0 +1,187 @@
+"""
+Batched, asynchronous persistence of event summaries to Firestore.
+
+Requests only enqueue the summary; one background flusher coalesces queued
+summaries into batched writes (flushed when SUMMARY_BATCH_MAX_DOCS are
+waiting or SUMMARY_BATCH_WINDOW_S has passed), retrying failed batches with
+jittered backoff. Set SUMMARY_STORE_BACKEND=memory to keep summaries in
+process instead, or point FIRESTORE_EMULATOR_HOST at the Firestore emulator.
+"""
+import asyncio
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+SUMMARY_STORE_BACKEND = os.getenv("SUMMARY_STORE_BACKEND", "firestore").lower()  # firestore, memory or off
+SUMMARY_COLLECTION = os.getenv("SUMMARY_COLLECTION", "event_summary")
+SUMMARY_QUEUE_SIZE = int(os.getenv("SUMMARY_QUEUE_SIZE", "1000"))
+# Firestore accepts at most 500 writes per batch
+SUMMARY_BATCH_MAX_DOCS = min(int(os.getenv("SUMMARY_BATCH_MAX_DOCS", "100")), 500)
+SUMMARY_BATCH_WINDOW_S = float(os.getenv("SUMMARY_BATCH_WINDOW_S", "1.0"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "5"))
+SUMMARY_RETRY_BASE_S = float(os.getenv("SUMMARY_RETRY_BASE_S", "0.5"))
+SUMMARY_FLUSH_TIMEOUT_S = float(os.getenv("SUMMARY_FLUSH_TIMEOUT_S", "8"))
+
+Document = Tuple[str, Dict[str, Any]]
+
+
+class FirestoreSink:
+    """Writes batches through one shared async Firestore client."""
+
+    def __init__(self, client=None):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.AsyncClient()
+        self.client = client
+
+    async def commit(self, collection: str, documents: List[Document]):
+        batch = self.client.batch()
+        for doc_id, data in documents:
+            # Ids are assigned at enqueue time, so a retried batch overwrites instead of duplicating
+            batch.set(self.client.collection(collection).document(doc_id), data)
+        await batch.commit()
+
+    async def close(self):
+        self.client.close()
+
+
+class InMemorySink:
+    """In-process stand-in for Firestore; `fail_times` makes the first commits fail, to exercise retries."""
+
+    def __init__(self, fail_times: int = 0):
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.commits = 0
+        self.fail_times = fail_times
+
+    async def commit(self, collection: str, documents: List[Document]):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError("Simulated Firestore outage")
+        self.commits += 1
+        self.collections.setdefault(collection, {}).update(documents)
+
+    async def close(self):
+        pass
+
+
+class SummaryWriter:
+    """Coalesces event summaries into batched writes off the response path."""
+
+    def __init__(self, sink, collection: str = SUMMARY_COLLECTION, queue_size: int = SUMMARY_QUEUE_SIZE,
+                 batch_max_docs: int = SUMMARY_BATCH_MAX_DOCS, batch_window_s: float = SUMMARY_BATCH_WINDOW_S,
+                 max_retries: int = SUMMARY_MAX_RETRIES, retry_base_s: float = SUMMARY_RETRY_BASE_S):
+        self.sink = sink
+        self.collection = collection
+        self.batch_max_docs = batch_max_docs
+        self.batch_window_s = batch_window_s
+        self.max_retries = max_retries
+        self.retry_base_s = retry_base_s
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._flusher: Optional[asyncio.Task] = None
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+
+    def enqueue(self, data: Dict[str, Any]) -> Optional[str]:
+        """Queue one summary without waiting; returns its document id, or None if it was dropped."""
+        if self._closed:
+            self.dropped += 1
+            return None
+        doc_id = uuid.uuid4().hex
+        try:
+            self._queue.put_nowait((doc_id, data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"Warning: summary queue full ({self._queue.qsize()}), dropping summary")
+            return None
+        self.enqueued += 1
+        return doc_id
+
+    async def _next_batch(self) -> List[Document]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_window_s
+        while len(batch) < self.batch_max_docs:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _commit_with_retry(self, batch: List[Document]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.sink.commit(self.collection, batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += len(batch)
+                    print(f"Error: giving up on {len(batch)} summaries after {attempt + 1} attempts: {e}")
+                    return
+                self.retries += 1
+                delay = self.retry_base_s * (2 ** attempt) + random.uniform(0, self.retry_base_s)
+                print(f"Warning: summary batch write failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _flush_loop(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._commit_with_retry(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def start(self):
+        if self._flusher is None:
+            self._closed = False
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self, timeout: float = SUMMARY_FLUSH_TIMEOUT_S):
+        """Stop accepting summaries and flush what is queued, for up to `timeout` seconds."""
+        self._closed = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.dropped += self._queue.qsize()
+            print(f"Error: summary flush timed out with {self._queue.qsize()} summaries unsaved")
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.sink.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.sink).__name__,
+            "depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+def create_summary_writer(backend: str = SUMMARY_STORE_BACKEND) -> Optional[SummaryWriter]:
+    """Build the writer for the configured backend; None when persistence is off or unavailable."""
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return SummaryWriter(InMemorySink())
+    try:
+        return SummaryWriter(FirestoreSink())
+    except Exception as e:
+        print(f"Warning: Firestore client unavailable, event summaries will not be stored: {e}")
+        return None
@@ -1,14 +1,17 @@
 import os
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 import mimetypes
-from typing import List, Dict
+from typing import List, Dict, Optional
 from google.genai import types
 import json
 from typing import List, Dict, Union
 
+from metropulse_common.json_repair import repair_json
+
 def get_media_type(file_path: str) -> str:
     """Determine if file is image or video"""
     mime_type, _ = mimetypes.guess_type(file_path)
@@ -24,13 +27,46 @@ def get_mime_type(file_path: str) -> str:
     mime_type, _ = mimetypes.guess_type(file_path)
     return mime_type or 'application/octet-stream'
 
+# Thread pool for blocking file reads of path-based media
+MEDIA_IO_WORKERS = int(os.getenv("MEDIA_IO_WORKERS", "4"))
+_media_io_pool = ThreadPoolExecutor(max_workers=MEDIA_IO_WORKERS, thread_name_prefix="media_io")
+
 def read_file_as_bytes(file_path: str) -> bytes:
-    """Read file as bytes"""
+    """Read file as bytes. Blocking: async callers go through load_media_files."""
     with open(file_path, 'rb') as f:
         return f.read()
 
+def _load_media_path(file_path: str) -> Optional[Dict[str, Union[str, bytes]]]:
+    try:
+        file_data = read_file_as_bytes(file_path)
+    except FileNotFoundError:
+        print(f"Warning: File {file_path} not found, skipping...")
+        return None
+    return {'mime_type': get_mime_type(file_path), 'data': file_data}
+
+async def load_media_files(media_files: List[Union[str, Dict[str, Union[str, bytes]]]]) -> List[Dict[str, Union[str, bytes]]]:
+    """Resolve file path items into mime_type/data dicts off the event loop"""
+    loop = asyncio.get_running_loop()
+
+    async def load(item):
+        if isinstance(item, str):
+            return await loop.run_in_executor(_media_io_pool, _load_media_path, item)
+        return item
+
+    loaded = await asyncio.gather(*(load(item) for item in media_files))
+    return [item for item in loaded if item is not None]
+
+async def build_media_content(media_files: List[Union[str, Dict[str, Union[str, bytes]]]], analysis_prompt: str) -> types.Content:
+    """create_media_content on the media I/O pool, so no part of it blocks the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_media_io_pool, create_media_content, media_files, analysis_prompt)
+
 def create_media_content(media_files: List[Union[str, Dict[str, Union[str, bytes]]]], analysis_prompt: str) -> types.Content:
-    """Create content with media files and analysis prompt"""
+    """
+    Create content with media files and analysis prompt.
+
+    Blocking (it may read file paths); async callers use build_media_content.
+    """
     parts = [types.Part(text=analysis_prompt)]
 
     for item in media_files:
@@ -59,11 +95,9 @@ def create_media_content(media_files: List[Union[str, Dict[str, Union[str, bytes
     return types.Content(role='user', parts=parts)
 
 
-import re
-import json
-
 def convert_response_to_json(llm_response):
-    clean_json_regex = r"```json\s*|\s*```"
-    cleaned_json = re.sub(clean_json_regex, '', llm_response, flags=re.MULTILINE)
-    parsed_data = json.loads(cleaned_json)
-    return parsed_data
\ No newline at end of file
+    """Parse the agent's JSON answer, repairing code fences, prose and other formatting slips locally."""
+    result = repair_json(llm_response, numeric_fields=())
+    if result.repairs:
+        print(f"Repaired agent JSON locally: {', '.join(result.repairs)}")
+    return result.value
@@ -0,0 +1,11 @@
+# metropulse_common/__init__.py
+"""
+Code shared by the MetroPulse agent service (metro_ai) and the event summary
+service (Backend/parallel_agent_setup): JSON repair, token accounting,
+telemetry and the model wrappers (offline fake, cassette, model limiter,
+retries and circuit breakers).
+
+Install it with `pip install -e common` for local runs; each service's
+deploy.sh copies it into the build context, so the images import it as a
+top-level package.
+"""
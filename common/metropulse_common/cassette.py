@@ -0,0 +1,162 @@
+# metropulse_common/cassette.py
+"""
+Record/replay of model traffic for offline benchmarking on real payloads.
+
+CASSETTE_MODE=record wraps every model so each request/response pair is
+appended to the cassette (gzipped JSON lines; each service sets its own
+CASSETTE_PATH) as it happens, off the event loop. The request is stored as
+its system instruction and contents, with media parts replaced by a hash of
+their bytes. Google Search runs inside Gemini, so its results are captured as
+the response's grounding metadata. CASSETTE_MODE=replay serves the recorded
+responses without any model call, sleeping for the recorded latency unless
+CASSETTE_REPLAY_LATENCY=false.
+
+Replay matches on a hash of the agent name, system instruction and contents.
+With CASSETTE_MATCH=agent, a request with no exact match gets the agent's
+recorded responses in turn, so a cassette recorded for one request can be
+replayed for any other.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import AsyncGenerator, Dict, List, Optional
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+from .model_wrappers import ModelWrapper
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()  # off, record or replay
+CASSETTE_REPLAY_LATENCY = os.getenv("CASSETTE_REPLAY_LATENCY", "true").lower() == "true"
+CASSETTE_MATCH = os.getenv("CASSETTE_MATCH", "exact").lower()  # exact or agent
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def _part_fingerprint(part) -> str:
+    if part.inline_data and part.inline_data.data:
+        return "blob:" + hashlib.sha256(part.inline_data.data).hexdigest()
+    return part.text or ""
+
+
+def serialize_request(llm_request: LlmRequest) -> dict:
+    """The parts of a request that decide its response, as recorded next to it."""
+    return {
+        "system_instruction": str(llm_request.config.system_instruction or "") if llm_request.config else "",
+        "contents": [
+            {"role": content.role, "parts": [_part_fingerprint(part) for part in (content.parts or [])]}
+            for content in llm_request.contents
+        ],
+    }
+
+
+def request_key(agent_name: str, request: dict) -> str:
+    contents = [[content["role"], content["parts"]] for content in request["contents"]]
+    raw = json.dumps([agent_name, request["system_instruction"], contents], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """One recorded interaction per line: agent, request key, the request, latency and the response chunks."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[dict]] = defaultdict(list)
+        self._by_agent: Dict[str, List[dict]] = defaultdict(list)
+        self._cursors: Dict[str, int] = defaultdict(int)
+
+    def load(self) -> "Cassette":
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._by_key[entry["key"]].append(entry)
+                    self._by_agent[entry["agent"]].append(entry)
+        logger.info(f"Loaded cassette {self.path}: {sum(map(len, self._by_agent.values()))} interactions")
+        return self
+
+    async def record(self, agent_name: str, key: str, request: dict, latency_ms: float,
+                     responses: List[LlmResponse]):
+        entry = {
+            "agent": agent_name,
+            "key": key,
+            "request": request,
+            "latency_ms": round(latency_ms, 1),
+            "responses": [response.model_dump(mode="json", exclude_none=True) for response in responses],
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Each append is its own gzip member, which gzip readers concatenate
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def _next(self, bucket: str, entries: List[dict]) -> dict:
+        with self._lock:
+            index = self._cursors[bucket] % len(entries)
+            self._cursors[bucket] += 1
+        return entries[index]
+
+    def lookup(self, agent_name: str, key: str, match: str = CASSETTE_MATCH) -> dict:
+        if self._by_key.get(key):
+            return self._next(f"key:{key}", self._by_key[key])
+        if match == "agent" and self._by_agent.get(agent_name):
+            return self._next(f"agent:{agent_name}", self._by_agent[agent_name])
+        raise CassetteMiss(f"No recorded response for {agent_name} (key {key}) in {self.path}")
+
+
+class CassetteLlm(BaseLlm):
+    """Records the wrapped model's responses, or replays them from the cassette."""
+    agent_name: str
+    mode: str
+    cassette: Cassette
+    inner: Optional[BaseLlm] = None
+    replay_latency: bool = CASSETTE_REPLAY_LATENCY
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        request = serialize_request(llm_request)
+        key = request_key(self.agent_name, request)
+        if self.mode == "replay":
+            entry = self.cassette.lookup(self.agent_name, key)
+            if self.replay_latency:
+                await asyncio.sleep(entry["latency_ms"] / 1000)
+            for response in entry["responses"]:
+                yield LlmResponse.model_validate(response)
+            return
+
+        started = time.perf_counter()
+        responses = []
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            responses.append(response)
+            yield response
+        await self.cassette.record(self.agent_name, key, request, (time.perf_counter() - started) * 1000, responses)
+
+
+def cassette_wrapper(path: str, mode: str = CASSETTE_MODE) -> ModelWrapper:
+    """Wraps every agent's model with a CassetteLlm sharing one cassette in the given mode."""
+    cassette = Cassette(path)
+    if mode == "replay":
+        cassette.load()
+    logger.warning(f"Cassette {mode} mode: {path}")
+
+    def wrap(agent_name: str, inner: BaseLlm) -> CassetteLlm:
+        return CassetteLlm(model=inner.model, agent_name=agent_name, mode=mode, cassette=cassette,
+                           inner=inner if mode == "record" else None)
+
+    return wrap
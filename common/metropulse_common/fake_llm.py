@@ -0,0 +1,99 @@
+# metropulse_common/fake_llm.py
+"""
+Deterministic stand-in for Gemini (and its built-in Google Search) so a
+service can be load-tested offline. Enable with LLM_BACKEND=fake; each
+service supplies the responders that shape its agents' answers.
+
+Latency is log-normal around FAKE_LLM_LATENCY_MS, plus FAKE_SEARCH_LATENCY_MS
+for requests that carry the google_search tool. FAKE_LLM_ITEMS and
+FAKE_LLM_TEXT_CHARS set output sizes, FAKE_LLM_MALFORMED_RATE corrupts that
+share of JSON answers, and FAKE_LLM_ERROR_RATE fails that share of calls
+with a 503.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, List
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import errors, types
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+
+@dataclass
+class FakeLlmProfile:
+    latency_ms: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+    latency_sigma: float = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+    search_latency_ms: float = float(os.getenv("FAKE_SEARCH_LATENCY_MS", "400"))
+    items: int = int(os.getenv("FAKE_LLM_ITEMS", "8"))
+    text_chars: int = int(os.getenv("FAKE_LLM_TEXT_CHARS", "200"))
+    malformed_rate: float = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0.0"))
+    error_rate: float = float(os.getenv("FAKE_LLM_ERROR_RATE", "0.0"))
+    seed: int = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+
+# (rng, profile, request) -> response text
+Responder = Callable[[random.Random, FakeLlmProfile, LlmRequest], str]
+
+_CORRUPTIONS = (
+    lambda text, rng: text[: max(1, int(len(text) * rng.uniform(0.5, 0.95)))],      # truncated
+    lambda text, rng: text.replace("]", ",]", 1),                                   # trailing comma
+    lambda text, rng: text.replace('"', "'"),                                       # single quotes
+    lambda text, rng: f"Here is what I found:\n```json\n{text}\n```\nHope this helps!",  # prose
+    lambda text, rng: text.replace('"name": ', '"name": ,', 1),                     # broken value
+)
+
+
+def corrupt_json(text: str, rng: random.Random) -> str:
+    return rng.choice(_CORRUPTIONS)(text, rng)
+
+
+def filler_text(rng: random.Random, chars: int) -> str:
+    words = ("live", "music", "city", "family", "drama", "spicy", "rooftop", "indie", "classic", "weekend")
+    out: List[str] = []
+    while sum(len(word) + 1 for word in out) < chars:
+        out.append(rng.choice(words))
+    return " ".join(out)
+
+
+class FakeLlm(BaseLlm):
+    """BaseLlm that sleeps for a sampled latency and answers through a responder."""
+    responder: Responder
+    profile: FakeLlmProfile
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def model_post_init(self, __context):
+        super().model_post_init(__context)
+        self._rng = random.Random(f"{self.profile.seed}:{self.model}:{self.responder.__name__}")
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        rng, profile = self._rng, self.profile
+        latency_ms = profile.latency_ms * math.exp(profile.latency_sigma * rng.gauss(0, 1))
+        tools = (llm_request.config.tools or []) if llm_request.config else []
+        if any(getattr(tool, "google_search", None) for tool in tools):
+            latency_ms += profile.search_latency_ms * math.exp(profile.latency_sigma * rng.gauss(0, 1))
+        await asyncio.sleep(latency_ms / 1000)
+
+        if rng.random() < profile.error_rate:
+            raise errors.ServerError(503, {"error": {"code": 503, "message": "Fake overload", "status": "UNAVAILABLE"}})
+
+        text = self.responder(rng, profile, llm_request)
+        if text.lstrip().startswith("{") and rng.random() < profile.malformed_rate:
+            text = corrupt_json(text, rng)
+
+        prompt_chars = sum(len(part.text or "") for content in llm_request.contents for part in (content.parts or []))
+        prompt_chars += len(str(llm_request.config.system_instruction or "")) if llm_request.config else 0
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4,
+                candidates_token_count=len(text) // 4,
+                total_token_count=(prompt_chars + len(text)) // 4,
+            ),
+        )
@@ -0,0 +1,278 @@
+# metropulse_common/json_repair.py
+"""
+Deterministic, pure-Python repair of the JSON defects LLMs commonly produce,
+used before falling back to an LLM corrector.
+"""
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+# How often each repair fired in this process
+repair_counts: Counter = Counter()
+
+# Only a fence opening or closing the whole answer; ``` inside a string is content
+_FENCE_RE = re.compile(r"^\s*```(?:json|JSON)?|```\s*$")
+_NUMBER_RE = re.compile(r"[-+]?\d+(?:\.\d+)?")
+# A number as models write it: sign, leading/trailing dot, exponent
+_NUMBER_TOKEN_RE = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+# Ends a bare token: whitespace, structure, quotes or a comment
+_TOKEN_END_RE = re.compile(r"""[\s,:\[\]{}"']|//|/\*|#""")
+_DANGLING_KEY_RE = re.compile(r'[{,]\s*"(?:[^"\\]|\\.)*"\s*$')
+_LITERALS = {"true": "true", "false": "false", "null": "null",
+             "True": "true", "False": "false", "None": "null",
+             "NaN": "null", "Infinity": "null", "undefined": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+@dataclass
+class RepairResult:
+    value: Any
+    repairs: List[str] = field(default_factory=list)
+
+
+def _skip_ws(text: str, i: int) -> int:
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return i
+
+
+def _drop_trailing_comma(out: List[str]) -> bool:
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+        return True
+    return False
+
+
+def _normalize(text: str, repairs: List[str]) -> str:
+    """
+    Single pass over the text that rewrites it into strict JSON: quotes,
+    comments, trailing commas, Python/JS literals, bare keys, trailing prose
+    and unterminated strings or brackets.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    fired = set()
+    i, n = 0, len(text)
+    started = False
+
+    def note(name: str):
+        if name not in fired:
+            fired.add(name)
+            repairs.append(name)
+
+    while i < n:
+        ch = text[i]
+
+        if ch in "\"'":
+            quote = ch
+            if quote == "'":
+                note("single_quotes")
+            out.append('"')
+            i += 1
+            closed = False
+            while i < n:
+                c = text[i]
+                if c == "\\" and i + 1 < n:
+                    nxt = text[i + 1]
+                    out.append("'" if nxt == "'" else c + nxt)
+                    i += 2
+                    continue
+                if c == quote:
+                    closed = True
+                    i += 1
+                    break
+                if c == '"':
+                    out.append('\\"')
+                elif c in "\n\r\t":
+                    note("control_chars_escaped")
+                    out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}[c])
+                else:
+                    out.append(c)
+                i += 1
+            if not closed:
+                note("unterminated_string")
+            out.append('"')
+            continue
+
+        if ch == "/" and i + 1 < n and text[i + 1] in "/*":
+            note("comments")
+            if text[i + 1] == "/":
+                end = text.find("\n", i)
+                i = n if end == -1 else end
+            else:
+                end = text.find("*/", i + 2)
+                i = n if end == -1 else end + 2
+            continue
+        if ch == "#":
+            note("comments")
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+
+        if ch in "{[":
+            stack.append(ch)
+            started = True
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch in "}]":
+            if _drop_trailing_comma(out):
+                note("trailing_commas")
+            if stack and _CLOSERS[stack[-1]] == ch:
+                stack.pop()
+                out.append(ch)
+            elif ch in [_CLOSERS[s] for s in stack]:
+                # Close the inner brackets the model forgot
+                note("mismatched_brackets")
+                while _CLOSERS[stack[-1]] != ch:
+                    out.append(_CLOSERS[stack.pop()])
+                stack.pop()
+                out.append(ch)
+            else:
+                note("stray_brackets")
+            i += 1
+            if started and not stack:
+                if text[_skip_ws(text, i):].strip():
+                    note("trailing_prose")
+                break
+            continue
+
+        number = _NUMBER_TOKEN_RE.match(text, i) if ch in "-+.0123456789" else None
+        if number:
+            j = _bare_token_end(text, i)
+            token = text[i:j]
+            if j == number.end():
+                try:
+                    json.loads(token)
+                except json.JSONDecodeError:
+                    # "+5", ".5", "5." or "007"
+                    note("non_json_numbers")
+                    token = json.dumps(float(token))
+                out.append(token)
+            else:
+                # A number with a suffix, e.g. 4.5/5, 20% or 1st
+                if _skip_ws(text, j) < n and text[_skip_ws(text, j)] == ":":
+                    note("unquoted_keys")
+                else:
+                    note("bare_words_quoted")
+                out.append(json.dumps(token))
+            i = j
+            continue
+
+        if ch.isalpha() or ch == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if _skip_ws(text, j) < n and text[_skip_ws(text, j)] == ":":
+                note("unquoted_keys")
+                out.append(json.dumps(word))
+            elif word in _LITERALS:
+                if _LITERALS[word] != word:
+                    note("non_json_literals")
+                out.append(_LITERALS[word])
+            else:
+                note("bare_words_quoted")
+                out.append(json.dumps(word))
+            i = j
+            continue
+
+        out.append(ch)
+        i += 1
+
+    if stack:
+        note("truncated")
+        if _drop_trailing_comma(out):
+            note("trailing_commas")
+        tail = "".join(out).rstrip()
+        if tail.endswith(":"):
+            out.append("null")
+        elif stack[-1] == "{" and _DANGLING_KEY_RE.search(tail):
+            out.append(":null")
+        while stack:
+            out.append(_CLOSERS[stack.pop()])
+
+    return "".join(out)
+
+
+def _bare_token_end(text: str, i: int) -> int:
+    end = _TOKEN_END_RE.search(text, i)
+    return len(text) if end is None else end.start()
+
+
+def _extract_candidate(text: str, repairs: List[str]) -> Optional[str]:
+    stripped = _FENCE_RE.sub("", text).strip()
+    if stripped != text.strip():
+        repairs.append("code_fences")
+    starts = [pos for pos in (stripped.find("{"), stripped.find("[")) if pos != -1]
+    if not starts:
+        return None
+    start = min(starts)
+    if start > 0:
+        repairs.append("leading_prose")
+    return stripped[start:]
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """Numbers hidden in strings like "4.5/5", "4.5 stars" or "Rating: 4.2"."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER_RE.search(value.replace(",", "."))
+        if match:
+            return float(match.group(0))
+    return None
+
+
+def coerce_numeric_fields(value: Any, fields: tuple, repairs: List[str]) -> Any:
+    """Convert numeric strings to floats for the given keys, anywhere in the structure."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in fields and isinstance(item, str):
+                number = parse_number(item)
+                value[key] = number
+                if "numeric_strings" not in repairs:
+                    repairs.append("numeric_strings")
+            else:
+                coerce_numeric_fields(item, fields, repairs)
+    elif isinstance(value, list):
+        for item in value:
+            coerce_numeric_fields(item, fields, repairs)
+    return value
+
+
+def repair_json(text: str, numeric_fields: tuple = ("rating",)) -> RepairResult:
+    """
+    Parse `text` as JSON, repairing common LLM defects when the strict parse
+    fails. Raises json.JSONDecodeError if no JSON value can be recovered.
+    """
+    if not isinstance(text, str):
+        raise json.JSONDecodeError("Expected a string", str(text), 0)
+
+    repairs: List[str] = []
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        candidate = _extract_candidate(text, repairs)
+        if candidate is None:
+            raise json.JSONDecodeError("No JSON object or array found", text, 0)
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            value = json.loads(_normalize(candidate, repairs))
+
+    coerce_numeric_fields(value, numeric_fields, repairs)
+    repair_counts.update(repairs)
+    return RepairResult(value=value, repairs=repairs)
+
+
+def loads_tolerant(text: str, numeric_fields: tuple = ("rating",)) -> Any:
+    return repair_json(text, numeric_fields).value
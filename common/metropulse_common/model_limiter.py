@@ -0,0 +1,258 @@
+# metropulse_common/model_limiter.py
+"""
+Admission control for outbound model calls, shared by every agent in the
+process.
+
+Each call takes a token from its model's bucket (MODEL_RATE_LIMITS, e.g.
+"gemini-2.0-flash=5:10" for 5 calls/s with bursts of 10; MODEL_RATE_DEFAULT
+for unlisted models; 0 means unlimited), then one of MODEL_MAX_CONCURRENCY
+slots. Calls that cannot start wait in a bounded queue; when
+MODEL_QUEUE_SIZE calls are already waiting, or a call would wait longer
+than MODEL_QUEUE_TIMEOUT_S, it fails fast with ModelOverloadedError, which
+the endpoints turn into a 429 with Retry-After.
+
+Traffic runs in the lane set with `traffic_lane()`: "interactive" (the
+default) or "background". Freed slots go to interactive waiters first, and
+background calls never hold more than MODEL_BACKGROUND_MAX_CONCURRENCY
+slots.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, Deque, Dict, Iterator, Optional, Tuple
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+from .model_wrappers import ModelWrapper
+
+logger = logging.getLogger(__name__)
+
+MODEL_LIMITER_ENABLED = os.getenv("MODEL_LIMITER_ENABLED", "true").lower() == "true"
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "16"))
+MODEL_BACKGROUND_MAX_CONCURRENCY = int(os.getenv("MODEL_BACKGROUND_MAX_CONCURRENCY", "4"))
+MODEL_QUEUE_SIZE = int(os.getenv("MODEL_QUEUE_SIZE", "64"))
+MODEL_QUEUE_TIMEOUT_S = float(os.getenv("MODEL_QUEUE_TIMEOUT_S", "10"))
+MODEL_RATE_LIMITS = os.getenv("MODEL_RATE_LIMITS", "")
+MODEL_RATE_DEFAULT = os.getenv("MODEL_RATE_DEFAULT", "0")
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+_lane: ContextVar[str] = ContextVar("traffic_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def traffic_lane(lane: str) -> Iterator[None]:
+    """Run the block's model calls (and tasks it creates) in the given lane."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+class ModelOverloadedError(Exception):
+    """A model call was refused because the limiter is saturated."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def reserve(self, max_wait_s: float) -> float:
+        """Take a token, possibly ahead of time; returns the seconds to wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        wait_s = max(0.0, (1 - self.tokens) / self.rate)
+        if wait_s > max_wait_s:
+            raise ModelOverloadedError(f"rate limit reached ({self.rate:g}/s)", retry_after=math.ceil(wait_s))
+        self.tokens -= 1
+        return wait_s
+
+
+def parse_rate(spec: str) -> Optional[Tuple[float, float]]:
+    """ "5:10" -> (5 calls/s, burst 10); "5" -> (5, 5); "0" or "" -> None (unlimited)."""
+    rate, _, burst = spec.strip().partition(":")
+    if not rate or float(rate) <= 0:
+        return None
+    return float(rate), float(burst or rate)
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rate = item.partition("=")
+        parsed = parse_rate(rate)
+        if parsed:
+            limits[model.strip()] = parsed
+    return limits
+
+
+class ModelLimiter:
+    """Per-model token buckets plus a global, two-lane concurrency limit with a bounded wait queue."""
+
+    def __init__(self, max_concurrency: int = MODEL_MAX_CONCURRENCY,
+                 background_max_concurrency: int = MODEL_BACKGROUND_MAX_CONCURRENCY,
+                 queue_size: int = MODEL_QUEUE_SIZE, queue_timeout_s: float = MODEL_QUEUE_TIMEOUT_S,
+                 rate_limits: str = MODEL_RATE_LIMITS, default_rate: str = MODEL_RATE_DEFAULT):
+        self.max_concurrency = max_concurrency
+        self.background_max_concurrency = min(background_max_concurrency, max_concurrency)
+        self.queue_size = queue_size
+        self.queue_timeout_s = queue_timeout_s
+        self._rate_limits = parse_rate_limits(rate_limits)
+        self._default_rate = parse_rate(default_rate)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._active = {lane: 0 for lane in LANES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        # Smoothed call duration, used to estimate Retry-After
+        self._avg_call_s = 1.0
+        self.metrics = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+                        "rejected_rate": 0, "max_queue_depth": 0}
+
+    # --- admission ---
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_call_s * (self.queue_depth + 1) / self.max_concurrency))
+
+    def check_admission(self):
+        """Fail fast, before any work starts, if new calls would be refused."""
+        if self.queue_depth >= self.queue_size:
+            self.metrics["rejected_queue_full"] += 1
+            raise ModelOverloadedError("model call queue is full", retry_after=self._retry_after())
+
+    def _can_start(self, lane: str) -> bool:
+        if sum(self._active.values()) >= self.max_concurrency:
+            return False
+        if lane == BACKGROUND:
+            return not self._waiters[INTERACTIVE] and self._active[BACKGROUND] < self.background_max_concurrency
+        return True
+
+    def _wake_waiters(self):
+        for lane in LANES:  # interactive first
+            waiters = self._waiters[lane]
+            while waiters and self._can_start(lane):
+                future = waiters.popleft()
+                if not future.done():
+                    self._active[lane] += 1
+                    future.set_result(None)
+
+    async def _acquire_slot(self, lane: str, timeout_s: float):
+        if not self._waiters[lane] and self._can_start(lane):
+            self._active[lane] += 1
+            return
+        self.check_admission()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(future)
+        self.metrics["queued"] += 1
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], self.queue_depth)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted in the same tick it timed out: hand the slot back
+                self._release_slot(lane)
+            else:
+                future.cancel()
+                if future in self._waiters[lane]:
+                    self._waiters[lane].remove(future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.metrics["rejected_timeout"] += 1
+            raise ModelOverloadedError(f"no model slot free within {self.queue_timeout_s:g}s",
+                                       retry_after=self._retry_after())
+
+    def _release_slot(self, lane: str):
+        self._active[lane] -= 1
+        self._wake_waiters()
+
+    def _bucket(self, model: str) -> Optional[TokenBucket]:
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            rate = self._rate_limits.get(model, self._default_rate)
+            if rate is None:
+                return None
+            bucket = self._buckets[model] = TokenBucket(*rate)
+        return bucket
+
+    @asynccontextmanager
+    async def slot(self, model: str, lane: Optional[str] = None):
+        """Hold one model call slot for the block, waiting within the queue timeout."""
+        lane = lane or current_lane()
+        deadline = time.monotonic() + self.queue_timeout_s
+        bucket = self._bucket(model)
+        if bucket is not None:
+            try:
+                wait_s = bucket.reserve(self.queue_timeout_s)
+            except ModelOverloadedError:
+                self.metrics["rejected_rate"] += 1
+                raise
+            if wait_s:
+                await asyncio.sleep(wait_s)
+        await self._acquire_slot(lane, max(0.0, deadline - time.monotonic()))
+        self.metrics["admitted"] += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_call_s += 0.1 * ((time.monotonic() - started) - self._avg_call_s)
+            self._release_slot(lane)
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "active": dict(self._active),
+            "waiting": {lane: len(waiters) for lane, waiters in self._waiters.items()},
+            "max_concurrency": self.max_concurrency,
+            "background_max_concurrency": self.background_max_concurrency,
+            "queue_size": self.queue_size,
+            "avg_call_s": round(self._avg_call_s, 3),
+            "rate_limits": {model: {"rate": rate, "burst": burst}
+                            for model, (rate, burst) in self._rate_limits.items()},
+        }
+
+
+class RateLimitedLlm(BaseLlm):
+    """Runs the wrapped model's calls through the shared ModelLimiter."""
+    inner: BaseLlm
+    limiter: ModelLimiter
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        async with self.limiter.slot(self.model):
+            async for response in self.inner.generate_content_async(llm_request, stream=stream):
+                yield response
+
+
+def rate_limited_wrapper(limiter: ModelLimiter) -> ModelWrapper:
+    """Routes every agent's model calls through the limiter."""
+    logger.info(f"Model limiter installed: {limiter.max_concurrency} slots "
+                f"({limiter.background_max_concurrency} background), queue {limiter.queue_size}")
+
+    def wrap(agent_name: str, inner: BaseLlm) -> RateLimitedLlm:
+        return RateLimitedLlm(model=inner.model, inner=inner, limiter=limiter)
+
+    return wrap
@@ -0,0 +1,12 @@
+# metropulse_common/model_wrappers.py
+"""
+The contract between the model wrappers in this package (cassette, model
+limiter, retries, the offline fake) and the services that install them.
+Each service walks its own agents and hands every model to the wrapper.
+"""
+from typing import Callable, Optional
+
+from google.adk.models import BaseLlm
+
+# (agent name, its current model) -> the model to use instead, or None to leave it as is
+ModelWrapper = Callable[[str, BaseLlm], Optional[BaseLlm]]
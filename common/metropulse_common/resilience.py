@@ -0,0 +1,285 @@
+# metropulse_common/resilience.py
+"""
+Retries, retry budget and circuit breakers for outbound model calls, shared
+by every agent in the process.
+
+Errors are classified before anything is retried:
+
+- transient: Gemini 5xx, 408/429, connection errors and timeouts. Retried,
+  and counted against the model's circuit breaker.
+- malformed: the model answered, but not with valid JSON or the expected
+  schema. Retried only by callers that ask for it (`retry_on`).
+- anything else, including errors that carry `retry_after` (this process's
+  own backpressure, e.g. ModelOverloadedError or an open circuit), fails at
+  once; retrying them would only add load.
+
+Retries wait with full-jitter exponential backoff (RETRY_BASE_DELAY_S
+doubling up to RETRY_MAX_DELAY_S) for at most RETRY_MAX_ATTEMPTS attempts.
+Across the process, retries may be at most RETRY_BUDGET_RATIO of the calls
+made in the last RETRY_BUDGET_WINDOW_S seconds (with RETRY_BUDGET_MIN
+always allowed), so a sustained outage cannot turn into a retry storm; a
+request past its token budget does not retry at all.
+
+Each model has a circuit breaker: BREAKER_FAILURE_THRESHOLD transient
+failures in a row open it, and calls then fail fast with CircuitOpenError
+for BREAKER_RESET_S seconds, after which a single probe call decides whether
+it closes again.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import AsyncGenerator, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+import httpx
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import errors
+from pydantic import ValidationError
+
+from .model_wrappers import ModelWrapper
+from .token_usage import current_request_usage
+
+logger = logging.getLogger(__name__)
+
+RESILIENCE_ENABLED = os.getenv("RESILIENCE_ENABLED", "true").lower() == "true"
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY_S = float(os.getenv("RETRY_BASE_DELAY_S", "0.5"))
+RETRY_MAX_DELAY_S = float(os.getenv("RETRY_MAX_DELAY_S", "8"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN = int(os.getenv("RETRY_BUDGET_MIN", "10"))
+RETRY_BUDGET_WINDOW_S = float(os.getenv("RETRY_BUDGET_WINDOW_S", "10"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_S = float(os.getenv("BREAKER_RESET_S", "30"))
+
+TRANSIENT = "transient"
+MALFORMED = "malformed"
+
+# Status codes worth another attempt: request timeout and rate limiting
+_RETRYABLE_CLIENT_CODES = (408, 429)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """A call was refused because the model's circuit breaker is open."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def classify(error: BaseException) -> Optional[str]:
+    """TRANSIENT, MALFORMED, or None for errors that must not be retried."""
+    if getattr(error, "retry_after", None) is not None:
+        return None
+    if isinstance(error, errors.ServerError):
+        return TRANSIENT
+    if isinstance(error, errors.ClientError):
+        return TRANSIENT if error.code in _RETRYABLE_CLIENT_CODES else None
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return TRANSIENT
+    if isinstance(error, (json.JSONDecodeError, ValidationError)):
+        return MALFORMED
+    return None
+
+
+def backoff_delay(attempt: int, base_s: float = RETRY_BASE_DELAY_S, max_s: float = RETRY_MAX_DELAY_S) -> float:
+    """Full jitter: uniform in [0, min(max_s, base_s * 2^(attempt - 1))]."""
+    return random.uniform(0, min(max_s, base_s * 2 ** (attempt - 1)))
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent calls, process-wide."""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: int = RETRY_BUDGET_MIN,
+                 window_s: float = RETRY_BUDGET_WINDOW_S):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_s = window_s
+        self._calls: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.metrics = {"calls": 0, "retries": 0, "retries_denied": 0}
+
+    def _trim(self, now: float):
+        for events in (self._calls, self._retries):
+            while events and now - events[0] > self.window_s:
+                events.popleft()
+
+    def record_call(self):
+        self._calls.append(time.monotonic())
+        self.metrics["calls"] += 1
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= max(self.min_retries, self.ratio * len(self._calls)):
+            self.metrics["retries_denied"] += 1
+            return False
+        self._retries.append(now)
+        self.metrics["retries"] += 1
+        return True
+
+    def stats(self) -> dict:
+        self._trim(time.monotonic())
+        return {**self.metrics, "window_calls": len(self._calls), "window_retries": len(self._retries)}
+
+
+class CircuitBreaker:
+    """Closed, open, or half-open with a single probe call in flight."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_s: float = BREAKER_RESET_S):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self.metrics = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_s else "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go ahead; half-open admits one probe."""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        self.metrics["rejected"] += 1
+        remaining = self.reset_s - (time.monotonic() - self.opened_at)
+        raise CircuitOpenError(f"circuit for {self.name} is open", retry_after=max(1, int(remaining + 0.999)))
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed.")
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._probing or (self.opened_at is None and self.consecutive_failures >= self.failure_threshold):
+            self.metrics["opened"] += 1
+            logger.warning(f"Circuit for {self.name} opened after {self.consecutive_failures} failures, "
+                           f"failing fast for {self.reset_s:g}s.")
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self):
+        """The probe ended without a verdict (e.g. cancelled or a non-retryable error)."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, **self.metrics}
+
+
+retry_budget = RetryBudget()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker(model)
+    return breaker
+
+
+async def run_with_retry(name: str, func: Callable[[], Awaitable[T]], retry_on: Tuple[str, ...] = (TRANSIENT,),
+                         breaker: Optional[CircuitBreaker] = None, max_attempts: int = RETRY_MAX_ATTEMPTS) -> T:
+    """
+    Await `func()` until it succeeds, its error is not in `retry_on`, or the
+    attempts, the retry budget or the request's token budget run out.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            breaker.before_call()
+        if attempt == 1:
+            retry_budget.record_call()
+        try:
+            result = await func()
+        except BaseException as e:
+            kind = classify(e) if isinstance(e, Exception) else None
+            if breaker is not None:
+                if kind == TRANSIENT:
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+            if kind not in retry_on or attempt >= max_attempts:
+                raise
+            request_usage = current_request_usage()
+            if request_usage is not None and request_usage.over_budget():
+                request_usage.skip(f"{name}_retry")
+                raise
+            if not retry_budget.try_spend():
+                logger.warning(f"Retry budget spent, not retrying {name} after {kind} error: {e}")
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"{name} failed ({kind}: {e}), retry {attempt}/{max_attempts - 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+
+def resilience_stats() -> dict:
+    return {
+        "enabled": RESILIENCE_ENABLED,
+        "max_attempts": RETRY_MAX_ATTEMPTS,
+        "retry_budget": retry_budget.stats(),
+        "breakers": {name: breaker.stats() for name, breaker in sorted(_breakers.items())},
+    }
+
+
+class ResilientLlm(BaseLlm):
+    """Retries the wrapped model's transient failures behind the model's circuit breaker."""
+    inner: BaseLlm
+    agent_name: str
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        if stream:
+            # A stream cannot be replayed once chunks have gone out, so it only goes through the breaker
+            breaker = breaker_for(self.model)
+            breaker.before_call()
+            try:
+                async for response in self.inner.generate_content_async(llm_request, stream=True):
+                    yield response
+            except BaseException as e:
+                if isinstance(e, Exception) and classify(e) == TRANSIENT:
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+                raise
+            breaker.record_success()
+            return
+
+        async def attempt():
+            return [response async for response in self.inner.generate_content_async(llm_request)]
+
+        for response in await run_with_retry(self.agent_name, attempt, breaker=breaker_for(self.model)):
+            yield response
+
+
+def resilient_wrapper() -> ModelWrapper:
+    """Retries every agent's transient model errors behind per-model circuit breakers."""
+    logger.info(f"Model retries installed: {RETRY_MAX_ATTEMPTS} attempts, breakers open after "
+                f"{BREAKER_FAILURE_THRESHOLD} failures for {BREAKER_RESET_S:g}s")
+
+    def wrap(agent_name: str, inner: BaseLlm) -> ResilientLlm:
+        return ResilientLlm(model=inner.model, inner=inner, agent_name=agent_name)
+
+    return wrap
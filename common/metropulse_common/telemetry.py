@@ -0,0 +1,260 @@
+# metropulse_common/telemetry.py
+"""
+Per-stage timing for the MetroPulse services.
+
+`span(stage, name)` times one unit of work into a Prometheus histogram
+(served as text by `render_metrics()` on /metrics) and opens an OpenTelemetry
+span of the same name. Spans are only exported when OTEL_TRACES_EXPORTER is
+"console", "otlp" or "gcp"; ADK's own invocation and model-call spans are
+exported alongside them.
+
+Model calls are timed through ADK model callbacks (`instrument_model_calls`),
+which also record each call's token usage (see token_usage.py). Google Search
+runs inside Gemini, so a search call is timed as the model call that carries
+the google_search tool.
+
+Each service calls `configure_service()` at import time to name its metrics
+(`<namespace>_stage_duration_seconds`, ...) and its tracer and spans.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+
+from .token_usage import RequestUsage, record_model_usage
+
+logger = logging.getLogger(__name__)
+
+OTEL_TRACES_EXPORTER = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()  # none, console, otlp or gcp
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS_NAMESPACE = "metropulse"
+tracer = trace.get_tracer(METRICS_NAMESPACE)
+
+
+class Histogram:
+    """A minimal thread-safe Prometheus histogram rendered in the text exposition format."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> (per-bucket counts with a final +Inf slot, sum)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self, prefix: str = "") -> str:
+        name = prefix + self.name
+        lines = [f"# HELP {name} {self.help_text}", f"# TYPE {name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            pairs = _label_pairs(self.label_names, key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_pairs = pairs + [f'le="{le}"']
+                lines.append(f"{name}_bucket{_braces(bucket_pairs)} {cumulative}")
+            lines.append(f"{name}_sum{_braces(pairs)} {total}")
+            lines.append(f"{name}_count{_braces(pairs)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_pairs(label_names: Sequence[str], key: Tuple[str, ...]) -> list:
+    return [f'{name}="{_escape(value)}"' for name, value in zip(label_names, key)]
+
+
+def _braces(pairs: list) -> str:
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A minimal thread-safe Prometheus counter."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, prefix: str = "") -> str:
+        name = prefix + self.name
+        lines = [f"# HELP {name} {self.help_text}", f"# TYPE {name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{name}{_braces(_label_pairs(self.label_names, key))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Duration of each pipeline stage.",
+    ("stage", "name", "outcome"),
+)
+
+MODEL_TOKENS = Counter(
+    "model_tokens_total",
+    "Model tokens used, by agent and kind (prompt or output).",
+    ("agent", "kind"),
+)
+
+REQUEST_TOKENS = Histogram(
+    "request_tokens",
+    "Model tokens used per request.",
+    (),
+    buckets=(1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000),
+)
+
+BUDGET_SKIPS = Counter(
+    "budget_skips_total",
+    "Optional model rounds skipped because the request's token budget ran out.",
+    ("stage",),
+)
+
+METRICS = [STAGE_SECONDS, MODEL_TOKENS, REQUEST_TOKENS, BUDGET_SKIPS]
+
+
+def configure_service(namespace: str, service_name: str):
+    """Prefix metric names with `namespace` and name spans' service `service_name` unless OTEL_SERVICE_NAME is set."""
+    global METRICS_NAMESPACE, OTEL_SERVICE_NAME, tracer
+    METRICS_NAMESPACE = namespace
+    OTEL_SERVICE_NAME = OTEL_SERVICE_NAME or service_name
+    tracer = trace.get_tracer(namespace)
+
+
+@contextmanager
+def span(stage: str, name: str, **attributes) -> Iterator[Optional[trace.Span]]:
+    """Time a block as `stage`/`name`; outcome is "error" if it raises, "cancelled" if cancelled."""
+    outcome = "ok"
+    started = time.perf_counter()
+    with tracer.start_as_current_span(f"{stage} {name}", attributes={"stage": stage, **attributes}) as otel_span:
+        try:
+            yield otel_span
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        except BaseException as e:
+            outcome = "cancelled" if type(e).__name__ == "CancelledError" else "error"
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, name=name, outcome=outcome)
+
+
+def render_metrics() -> str:
+    return "".join(metric.render(f"{METRICS_NAMESPACE}_") for metric in METRICS)
+
+
+# --- Model calls, timed through ADK callbacks ---
+
+# (invocation id, agent name) -> (stage, start time). Calls that fail never
+# reach the after callback, so their entries are pruned once they are old.
+_model_calls: Dict[Tuple[str, str], Tuple[str, float]] = {}
+_MODEL_CALLS_MAX = 1024
+_MODEL_CALL_MAX_AGE_S = 600
+
+
+def _before_model(callback_context, llm_request):
+    tools = (llm_request.config.tools or []) if llm_request.config else []
+    stage = "search" if any(getattr(tool, "google_search", None) for tool in tools) else "model"
+    now = time.perf_counter()
+    if len(_model_calls) >= _MODEL_CALLS_MAX:
+        for key, (_, started_at) in list(_model_calls.items()):
+            if now - started_at > _MODEL_CALL_MAX_AGE_S:
+                _model_calls.pop(key, None)
+    _model_calls[(callback_context.invocation_id, callback_context.agent_name)] = (stage, now)
+    return None
+
+
+def _after_model(callback_context, llm_response):
+    started = _model_calls.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    stage = "model"
+    if started is not None:
+        stage, started_at = started
+        outcome = "error" if llm_response.error_code else "ok"
+        STAGE_SECONDS.observe(time.perf_counter() - started_at, stage=stage,
+                              name=callback_context.agent_name, outcome=outcome)
+    if not llm_response.partial:
+        usage = record_model_usage(callback_context.agent_name, llm_response.usage_metadata, search=stage == "search")
+        MODEL_TOKENS.inc(usage.prompt_tokens, agent=callback_context.agent_name, kind="prompt")
+        MODEL_TOKENS.inc(usage.output_tokens, agent=callback_context.agent_name, kind="output")
+    return None
+
+
+def observe_request_usage(request_usage: RequestUsage):
+    REQUEST_TOKENS.observe(request_usage.total.total_tokens)
+    for stage, count in request_usage.skipped.items():
+        BUDGET_SKIPS.inc(count, stage=stage)
+
+
+def instrument_model_calls(agent):
+    """Time every model call of an LlmAgent that has no model callbacks of its own."""
+    if agent.before_model_callback is None and agent.after_model_callback is None:
+        agent.before_model_callback = _before_model
+        agent.after_model_callback = _after_model
+
+
+def configure_tracing(exporter: str = OTEL_TRACES_EXPORTER):
+    """Install an SDK tracer provider exporting to the configured backend; no-op for "none"."""
+    if exporter in ("", "none"):
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if exporter == "console":
+            span_exporter = ConsoleSpanExporter()
+        elif exporter == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            span_exporter = OTLPSpanExporter()
+        elif exporter == "gcp":
+            from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+            span_exporter = CloudTraceSpanExporter()
+        else:
+            logger.warning(f"Unknown OTEL_TRACES_EXPORTER '{exporter}', spans will not be exported.")
+            return
+    except ImportError as e:
+        logger.warning(f"OpenTelemetry exporter '{exporter}' is not installed, spans will not be exported: {e}")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME or METRICS_NAMESPACE}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Exporting OpenTelemetry spans to {exporter}.")
+
+
+def shutdown_tracing():
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
@@ -0,0 +1,172 @@
+# metropulse_common/token_usage.py
+"""
+Token and cost accounting for model calls.
+
+`track_request()` scopes a RequestUsage to the current request (through a
+context variable, so sub-agents running in child tasks add to the same
+object). The model callbacks in telemetry.py record every call's
+usage_metadata into it and into the process-wide `usage_totals`, which
+aggregate per agent and per location.
+
+REQUEST_TOKEN_BUDGET caps the tokens one request may spend (0 = no cap).
+Once a request is over budget, optional model rounds (e.g. corrector
+repairs or a merge retry) are skipped instead of run.
+
+Costs are estimates from MODEL_PRICE_INPUT_PER_M / MODEL_PRICE_OUTPUT_PER_M
+(USD per million tokens) plus SEARCH_PRICE_PER_CALL per grounded call.
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional
+
+REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "0"))
+MODEL_PRICE_INPUT_PER_M = float(os.getenv("MODEL_PRICE_INPUT_PER_M", "0.10"))
+MODEL_PRICE_OUTPUT_PER_M = float(os.getenv("MODEL_PRICE_OUTPUT_PER_M", "0.40"))
+SEARCH_PRICE_PER_CALL = float(os.getenv("SEARCH_PRICE_PER_CALL", "0.035"))
+USAGE_MAX_LOCATIONS = int(os.getenv("USAGE_MAX_LOCATIONS", "1000"))
+
+
+@dataclass
+class TokenUsage:
+    calls: int = 0
+    search_calls: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+    @property
+    def cost_usd(self) -> float:
+        return (self.prompt_tokens * MODEL_PRICE_INPUT_PER_M + self.output_tokens * MODEL_PRICE_OUTPUT_PER_M) / 1e6 \
+            + self.search_calls * SEARCH_PRICE_PER_CALL
+
+    def add(self, other: "TokenUsage"):
+        self.calls += other.calls
+        self.search_calls += other.search_calls
+        self.prompt_tokens += other.prompt_tokens
+        self.output_tokens += other.output_tokens
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "search_calls": self.search_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+def usage_from_metadata(usage_metadata, search: bool = False) -> TokenUsage:
+    usage = TokenUsage(calls=1, search_calls=1 if search else 0)
+    if usage_metadata is not None:
+        usage.prompt_tokens = usage_metadata.prompt_token_count or 0
+        # Thinking tokens are billed as output
+        usage.output_tokens = (usage_metadata.candidates_token_count or 0) + (usage_metadata.thoughts_token_count or 0)
+    return usage
+
+
+@dataclass
+class RequestUsage:
+    """Token usage of one request, per agent, against an optional budget."""
+    budget: int = REQUEST_TOKEN_BUDGET
+    by_agent: Dict[str, TokenUsage] = field(default_factory=dict)
+    skipped: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, agent_name: str, usage: TokenUsage):
+        self.by_agent.setdefault(agent_name, TokenUsage()).add(usage)
+
+    @property
+    def total(self) -> TokenUsage:
+        total = TokenUsage()
+        for usage in self.by_agent.values():
+            total.add(usage)
+        return total
+
+    def over_budget(self) -> bool:
+        return self.budget > 0 and self.total.total_tokens >= self.budget
+
+    def skip(self, stage: str):
+        """Note that an optional stage was skipped because the budget ran out."""
+        self.skipped[stage] = self.skipped.get(stage, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            **self.total.to_dict(),
+            "budget": self.budget or None,
+            "skipped": dict(self.skipped),
+            "by_agent": {agent: usage.to_dict() for agent, usage in sorted(self.by_agent.items())},
+        }
+
+
+_current_request: ContextVar[Optional[RequestUsage]] = ContextVar("current_request_usage", default=None)
+
+
+@contextmanager
+def track_request(budget: int = REQUEST_TOKEN_BUDGET) -> Iterator[RequestUsage]:
+    request_usage = RequestUsage(budget=budget)
+    token = _current_request.set(request_usage)
+    try:
+        yield request_usage
+    finally:
+        _current_request.reset(token)
+
+
+def current_request_usage() -> Optional[RequestUsage]:
+    return _current_request.get()
+
+
+class UsageTotals:
+    """Process-wide usage per agent and per location (the most recent USAGE_MAX_LOCATIONS)."""
+
+    def __init__(self, max_locations: int = USAGE_MAX_LOCATIONS):
+        self.max_locations = max_locations
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.by_agent: Dict[str, TokenUsage] = {}
+        self.by_location: "OrderedDict[str, TokenUsage]" = OrderedDict()
+
+    def record_call(self, agent_name: str, usage: TokenUsage):
+        with self._lock:
+            self.by_agent.setdefault(agent_name, TokenUsage()).add(usage)
+
+    def record_request(self, location_key: str, request_usage: RequestUsage):
+        with self._lock:
+            self.requests += 1
+            usage = self.by_location.pop(location_key, None) or TokenUsage()
+            usage.add(request_usage.total)
+            self.by_location[location_key] = usage
+            while len(self.by_location) > self.max_locations:
+                self.by_location.popitem(last=False)
+
+    def stats(self, top_locations: int = 20) -> dict:
+        with self._lock:
+            total = TokenUsage()
+            for usage in self.by_agent.values():
+                total.add(usage)
+            locations = sorted(self.by_location.items(), key=lambda item: item[1].total_tokens, reverse=True)
+            return {
+                "requests": self.requests,
+                "total": total.to_dict(),
+                "by_agent": {agent: usage.to_dict() for agent, usage in sorted(self.by_agent.items())},
+                "top_locations": {location: usage.to_dict() for location, usage in locations[:top_locations]},
+            }
+
+
+usage_totals = UsageTotals()
+
+
+def record_model_usage(agent_name: str, usage_metadata, search: bool = False) -> TokenUsage:
+    """Add one model call's usage to the current request and the process totals."""
+    usage = usage_from_metadata(usage_metadata, search)
+    usage_totals.record_call(agent_name, usage)
+    request_usage = current_request_usage()
+    if request_usage is not None:
+        request_usage.record(agent_name, usage)
+    return usage
@@ -0,0 +1,232 @@
+"""
+Async load generator for both FastAPI services.
+
+By default the service runs in this process with LLM_BACKEND=fake, so no
+Gemini, Search, GCS or Firestore access is needed; the fake model is tuned
+with the FAKE_LLM_* variables (see fake_llm.py in each service). Pass --url
+to load an already running server instead, and --pid to sample its memory.
+
+Reports throughput, p50/p95/p99 latency and peak RSS per concurrency level,
+and writes the results to loadtest/results/ for run-over-run comparison.
+
+    python loadtest/run_load.py metro --concurrency 1,8,32 --requests 200
+    FAKE_LLM_MALFORMED_RATE=0.2 python loadtest/run_load.py backend --compare loadtest/results/backend_<ts>.json
+
+To benchmark against recorded model traffic, record a cassette from a real
+run and replay it here (see cassette.py in each service):
+
+    LLM_BACKEND=gemini CASSETTE_MODE=record CASSETTE_PATH=/tmp/metro.jsonl.gz python loadtest/run_load.py metro --requests 5 --concurrency 1
+    CASSETTE_MODE=replay CASSETTE_MATCH=agent CASSETTE_PATH=/tmp/metro.jsonl.gz python loadtest/run_load.py metro
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "loadtest", "results")
+
+SERVICES = {
+    "metro": {
+        "dir": os.path.join(ROOT, "metro_ai"),
+        "path": "/get-location-info",
+        "env": {"PREWARM_ENABLED": "false", "ARTIFACT_BACKEND": "local"},
+    },
+    "backend": {
+        "dir": os.path.join(ROOT, "Backend", "parallel_agent_setup"),
+        "path": "/event_summary/",
+        "env": {"SUMMARY_STORE_BACKEND": "memory", "MEDIA_CACHE_ENABLED": "false"},
+    },
+}
+
+
+def build_payload(service: str, i: int, distinct: int, media_kb: int) -> dict:
+    n = i % distinct
+    if service == "metro":
+        return {"location": f"Loadtest Location {n}", "location_type": "city"}
+    payload = {
+        "event_name": f"Loadtest Event {n}",
+        "event_description": "Crowd gathering near the metro station with live music.",
+        "event_location": "Indiranagar, Bangalore",
+    }
+    if media_kb:
+        payload["media_file"] = [{"mimeType": "image/jpeg", "bytes": [n % 256] * (media_kb * 1024)}]
+    return payload
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def sample_peak_rss(pid: int, peak: List[float], interval_s: float = 0.02):
+    while True:
+        peak[0] = max(peak[0], rss_mb(pid))
+        await asyncio.sleep(interval_s)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile: the smallest value with at least pct% of values at or below it."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_level(client: httpx.AsyncClient, service: str, concurrency: int, requests: int,
+                    distinct: int, media_kb: int, pid: int, offset: int) -> dict:
+    path = SERVICES[service]["path"]
+    latencies, statuses = [], {}
+    next_index = iter(range(requests))
+
+    async def worker():
+        for i in next_index:
+            payload = build_payload(service, offset + i, distinct, media_kb)
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    peak = [rss_mb(pid)]
+    rss_start = peak[0]
+    sampler = asyncio.create_task(sample_peak_rss(pid, peak))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": ok,
+        "errors": requests - ok,
+        "statuses": statuses,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        "rss_start_mb": round(rss_start, 1),
+        "peak_rss_mb": round(peak[0], 1),
+    }
+
+
+@contextlib.asynccontextmanager
+async def in_process_client(service: str):
+    """Import the service with the fake LLM and serve it over an ASGI transport."""
+    spec = SERVICES[service]
+    workdir = tempfile.mkdtemp(prefix=f"loadtest_{service}_")
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("SNAPSHOT_DB_PATH", os.path.join(workdir, "snapshots.db"))
+    os.environ.setdefault("ARTIFACT_LOCAL_DIR", os.path.join(workdir, "artifacts"))
+    os.environ.setdefault("MEDIA_CACHE_DIR", os.path.join(workdir, "media_cache"))
+    for key, value in spec["env"].items():
+        os.environ.setdefault(key, value)
+    sys.path.insert(0, os.path.join(ROOT, "common"))  # metropulse_common, unless pip-installed
+    sys.path.insert(0, spec["dir"])
+    os.chdir(spec["dir"])
+
+    import main  # the service's own main.py
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            yield client
+
+
+def print_table(levels: List[dict], baseline: Optional[dict] = None):
+    base = {level["concurrency"]: level for level in (baseline or {}).get("levels", [])}
+    print(f"{'conc':>5} {'ok/req':>10} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>9}"
+          + ("  vs baseline (rps, p95)" if base else ""))
+    for level in levels:
+        line = (f"{level['concurrency']:>5} {level['ok']:>5}/{level['requests']:<4} {level['throughput_rps']:>9.2f} "
+                f"{level['p50_ms']:>9.1f} {level['p95_ms']:>9.1f} {level['p99_ms']:>9.1f} {level['peak_rss_mb']:>9.1f}")
+        previous = base.get(level["concurrency"])
+        if previous:
+            rps_delta = (level["throughput_rps"] / previous["throughput_rps"] - 1) * 100 if previous["throughput_rps"] else 0
+            p95_delta = (level["p95_ms"] / previous["p95_ms"] - 1) * 100 if previous["p95_ms"] else 0
+            line += f"  {rps_delta:+.1f}%, {p95_delta:+.1f}%"
+        print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=50, help="requests per level")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="distinct locations/events per level; 0 makes every request unique (no cache hits)")
+    parser.add_argument("--media-kb", type=int, default=0, help="attach a media file of this size (backend only)")
+    parser.add_argument("--url", help="load a running server instead of an in-process instance")
+    parser.add_argument("--pid", type=int, help="server process to sample RSS from, with --url")
+    parser.add_argument("--out", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+    # The in-process mode changes into the service directory
+    args.out = os.path.abspath(args.out)
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    if args.url:
+        client_cm = httpx.AsyncClient(base_url=args.url, timeout=None)
+        pid = args.pid or 0
+    else:
+        client_cm = in_process_client(args.service)
+        pid = os.getpid()
+
+    results = []
+    async with client_cm as client:
+        offset = 0
+        for concurrency in levels:
+            distinct = args.distinct or args.requests * len(levels)
+            results.append(await run_level(client, args.service, concurrency, args.requests,
+                                           distinct, args.media_kb, pid, offset))
+            # Unique payloads across levels too, so a later level never hits an earlier level's cache
+            offset += args.requests
+
+    report = {
+        "service": args.service,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "config": {
+            "requests": args.requests, "distinct": args.distinct, "media_kb": args.media_kb,
+            **{key: value for key, value in sorted(os.environ.items())
+               if key.startswith(("FAKE_LLM_", "FAKE_SEARCH_", "LLM_BACKEND", "CASSETTE_", "MODEL_", "RETRY_", "BREAKER_"))},
+        },
+        "levels": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{args.service}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
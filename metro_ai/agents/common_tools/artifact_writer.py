@@ -0,0 +1,157 @@
+# agents/common_tools/artifact_writer.py
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from google.adk.artifacts import BaseArtifactService
+from google.genai import types
+
+from metropulse_common.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_QUEUE_SIZE = int(os.getenv("ARTIFACT_QUEUE_SIZE", "256"))
+ARTIFACT_CONCURRENCY = int(os.getenv("ARTIFACT_CONCURRENCY", "4"))
+ARTIFACT_MAX_RETRIES = int(os.getenv("ARTIFACT_MAX_RETRIES", "4"))
+ARTIFACT_RETRY_BASE_S = float(os.getenv("ARTIFACT_RETRY_BASE_S", "0.5"))
+# How long a request may wait for queue space before its artifact is dropped
+ARTIFACT_ENQUEUE_TIMEOUT_S = float(os.getenv("ARTIFACT_ENQUEUE_TIMEOUT_S", "0.1"))
+# Cloud Run allows 10s between SIGTERM and SIGKILL
+ARTIFACT_FLUSH_TIMEOUT_S = float(os.getenv("ARTIFACT_FLUSH_TIMEOUT_S", "8"))
+
+
+@dataclass
+class ArtifactJob:
+    app_name: str
+    user_id: str
+    session_id: str
+    filename: str
+    artifact: types.Part
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class ArtifactWriter:
+    """
+    Write-behind persistence for artifacts.
+
+    Requests hand their artifacts to a bounded queue and move on; a fixed set
+    of workers takes one job at a time off it, retries failed saves with jittered
+    exponential backoff, and flushes what is left on shutdown. When the queue
+    is full, producers wait up to ARTIFACT_ENQUEUE_TIMEOUT_S for space and the
+    artifact is dropped (and counted) after that.
+    """
+
+    def __init__(self, artifact_service: BaseArtifactService, queue_size: int = ARTIFACT_QUEUE_SIZE,
+                 concurrency: int = ARTIFACT_CONCURRENCY,
+                 max_retries: int = ARTIFACT_MAX_RETRIES, retry_base_s: float = ARTIFACT_RETRY_BASE_S):
+        self.artifact_service = artifact_service
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_base_s = retry_base_s
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._workers: List[asyncio.Task] = []
+        self._closed = False
+        self.metrics: Dict[str, float] = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "dropped": 0,
+            "retries": 0,
+            "max_depth": 0,
+            "enqueue_wait_ms": 0.0,
+            "write_lag_ms_max": 0.0,
+        }
+
+    # --- producer side ---
+
+    async def submit(self, app_name: str, user_id: str, session_id: str, filename: str,
+                     artifact: types.Part, timeout: float = ARTIFACT_ENQUEUE_TIMEOUT_S) -> bool:
+        """Queue an artifact for saving; returns False if it was dropped."""
+        if self._closed:
+            self.metrics["dropped"] += 1
+            logger.warning(f"Artifact writer is closed, dropping {filename}")
+            return False
+
+        job = ArtifactJob(app_name, user_id, session_id, filename, artifact)
+        started = time.perf_counter()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(job), timeout)
+            except asyncio.TimeoutError:
+                self.metrics["dropped"] += 1
+                logger.warning(f"Artifact queue full ({self._queue.qsize()}), dropping {filename}")
+                return False
+            finally:
+                self.metrics["enqueue_wait_ms"] += (time.perf_counter() - started) * 1000
+        self.metrics["enqueued"] += 1
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], self._queue.qsize())
+        return True
+
+    # --- consumer side ---
+
+    async def _save_with_retry(self, job: ArtifactJob):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("artifact_save", type(self.artifact_service).__name__, attempt=attempt):
+                    await self.artifact_service.save_artifact(
+                        app_name=job.app_name, user_id=job.user_id, session_id=job.session_id,
+                        filename=job.filename, artifact=job.artifact,
+                    )
+                self.metrics["written"] += 1
+                lag_ms = (time.monotonic() - job.enqueued_at) * 1000
+                self.metrics["write_lag_ms_max"] = max(self.metrics["write_lag_ms_max"], lag_ms)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.metrics["failed"] += 1
+                    logger.error(f"Giving up on artifact {job.filename} after {attempt + 1} attempts: {e}")
+                    return
+                self.metrics["retries"] += 1
+                delay = self.retry_base_s * (2 ** attempt) + random.uniform(0, self.retry_base_s)
+                logger.warning(f"Saving artifact {job.filename} failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._save_with_retry(job)
+            finally:
+                self._queue.task_done()
+
+    # --- lifecycle ---
+
+    def start(self):
+        if not self._workers:
+            self._closed = False
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+            logger.info(f"Artifact writer started with {self.concurrency} workers.")
+
+    async def stop(self, timeout: float = ARTIFACT_FLUSH_TIMEOUT_S):
+        """Stop accepting artifacts, flush the queue for up to `timeout` seconds, then stop the workers."""
+        self._closed = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.metrics["dropped"] += self._queue.qsize()
+            logger.error(f"Artifact flush timed out with {self._queue.qsize()} artifacts unsaved.")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info(f"Artifact writer stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "depth": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "workers": len(self._workers),
+            "closed": self._closed,
+        }
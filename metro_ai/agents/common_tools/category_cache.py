@@ -0,0 +1,102 @@
+# agents/common_tools/category_cache.py
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+# Default time a sub-agent gets before its category is served stale or left pending (0 = no limit)
+SUB_AGENT_DEADLINE_S = os.getenv("SUB_AGENT_DEADLINE_S", "30")
+
+
+@dataclass(frozen=True)
+class CategorySpec:
+    """How one data category is produced by its sub-agent, how long it may take and how long it stays fresh."""
+    name: str
+    agent_name: str
+    output_key: str
+    section_keys: Tuple[str, ...]
+    ttl_s: float
+    deadline_s: float
+
+
+# Showtimes change daily, concerts weekly, restaurant lists barely at all
+CATEGORY_SPECS: Dict[str, CategorySpec] = {
+    "movies": CategorySpec(
+        name="movies", agent_name="MovieAgent", output_key="movies_info",
+        section_keys=("movies",),
+        ttl_s=float(os.getenv("MOVIES_TTL_S", str(4 * 3600))),
+        deadline_s=float(os.getenv("MOVIES_DEADLINE_S", SUB_AGENT_DEADLINE_S)),
+    ),
+    "restaurants": CategorySpec(
+        name="restaurants", agent_name="RestaurantAgent", output_key="restaurant_info",
+        section_keys=("veg_restaurants", "nonveg_restaurants"),
+        ttl_s=float(os.getenv("RESTAURANTS_TTL_S", str(7 * 24 * 3600))),
+        deadline_s=float(os.getenv("RESTAURANTS_DEADLINE_S", SUB_AGENT_DEADLINE_S)),
+    ),
+    "concerts": CategorySpec(
+        name="concerts", agent_name="ConcertAgent", output_key="concert_info",
+        section_keys=("concerts",),
+        ttl_s=float(os.getenv("CONCERTS_TTL_S", str(24 * 3600))),
+        deadline_s=float(os.getenv("CONCERTS_DEADLINE_S", SUB_AGENT_DEADLINE_S)),
+    ),
+}
+
+# (location, category) sections kept in memory; the least recently used go first
+CATEGORY_CACHE_MAX_ENTRIES = int(os.getenv("CATEGORY_CACHE_MAX_ENTRIES", "3000"))
+
+
+def normalize_location_key(location: str, location_type: str = "city") -> Tuple[str, str]:
+    """Case- and whitespace-insensitive key for a location, shared by every cache and the snapshot store."""
+    return " ".join(location.lower().split()), location_type.strip().lower()
+
+
+@dataclass
+class CategorySnapshot:
+    payload: Dict[str, Any]
+    fetched_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class CategoryCache:
+    """
+    Latest validated section per (location, category), at most `max_entries`
+    of them with the least recently used evicted first.
+
+    The payload has the same shape the sub-agent is asked to return (e.g.
+    {"movies": [...]}), so a cached section can stand in for a fresh run.
+    """
+
+    def __init__(self, max_entries: int = CATEGORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._snapshots: "OrderedDict[Tuple[Tuple[str, str], str], CategorySnapshot]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, location: str, location_type: str, category: str) -> Optional[CategorySnapshot]:
+        key = (normalize_location_key(location, location_type), category)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            self._snapshots.move_to_end(key)
+        return snapshot
+
+    def get_fresh(self, location: str, location_type: str, category: str) -> Optional[CategorySnapshot]:
+        snapshot = self.get(location, location_type, category)
+        if snapshot is not None and snapshot.age < CATEGORY_SPECS[category].ttl_s:
+            return snapshot
+        return None
+
+    def put(self, location: str, location_type: str, category: str, payload: Dict[str, Any],
+            fetched_at: Optional[float] = None):
+        key = (normalize_location_key(location, location_type), category)
+        self._snapshots[key] = CategorySnapshot(payload=payload, fetched_at=fetched_at or time.time())
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.max_entries:
+            self._snapshots.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
@@ -0,0 +1,109 @@
+# agents/common_tools/local_artifact_service.py
+import asyncio
+import os
+import threading
+from typing import List, Optional
+
+from google.adk.artifacts import BaseArtifactService
+from google.genai import types
+
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
+
+class LocalArtifactService(BaseArtifactService):
+    """
+    Filesystem artifact backend for local runs and tests. Files are laid out
+    like GcsArtifactService's blob names,
+    <root>/<app>/<user>/<session or "user">/<filename>/<version>, with the
+    MIME type kept next to each version in <version>.mime.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+        # Version numbers are picked from the directory listing, so saves are serialized
+        self._lock = threading.Lock()
+
+    def _artifact_dir(self, app_name: str, user_id: str, session_id: str, filename: str) -> str:
+        scope = "user" if filename.startswith("user:") else session_id
+        parts = [app_name, user_id, scope, *filename.split("/")]
+        if any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Invalid artifact path component in {parts}")
+        return os.path.join(self.root_dir, *parts)
+
+    @staticmethod
+    def _versions(path: str) -> List[int]:
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(name) for name in os.listdir(path) if name.isdigit())
+
+    def _save(self, path: str, artifact: types.Part) -> int:
+        with self._lock:
+            return self._save_locked(path, artifact)
+
+    def _save_locked(self, path: str, artifact: types.Part) -> int:
+        os.makedirs(path, exist_ok=True)
+        versions = self._versions(path)
+        version = versions[-1] + 1 if versions else 0
+        blob = artifact.inline_data
+        data = blob.data if blob else (artifact.text or "").encode("utf-8")
+        mime_type = blob.mime_type if blob and blob.mime_type else DEFAULT_MIME_TYPE
+        # Write to a temp name and rename, so readers never see a partial version
+        tmp_path = os.path.join(path, f".{version}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with open(os.path.join(path, f"{version}.mime"), "w") as f:
+            f.write(mime_type)
+        os.replace(tmp_path, os.path.join(path, str(version)))
+        return version
+
+    def _load(self, path: str, version: Optional[int]) -> Optional[types.Part]:
+        versions = self._versions(path)
+        if not versions:
+            return None
+        version = versions[-1] if version is None else version
+        if version not in versions:
+            return None
+        with open(os.path.join(path, str(version)), "rb") as f:
+            data = f.read()
+        mime_path = os.path.join(path, f"{version}.mime")
+        mime_type = DEFAULT_MIME_TYPE
+        if os.path.exists(mime_path):
+            with open(mime_path) as f:
+                mime_type = f.read().strip() or DEFAULT_MIME_TYPE
+        return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+    def _list_keys(self, app_name: str, user_id: str, session_id: str) -> List[str]:
+        keys = []
+        for scope in (session_id, "user"):
+            scope_dir = os.path.join(self.root_dir, app_name, user_id, scope)
+            for dirpath, _, filenames in os.walk(scope_dir):
+                if any(name.isdigit() for name in filenames):
+                    keys.append(os.path.relpath(dirpath, scope_dir).replace(os.sep, "/"))
+        return sorted(keys)
+
+    def _delete(self, path: str):
+        for version in self._versions(path):
+            for name in (str(version), f"{version}.mime"):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+
+    async def save_artifact(self, *, app_name: str, user_id: str, session_id: str,
+                            filename: str, artifact: types.Part) -> int:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+        return await asyncio.to_thread(self._save, path, artifact)
+
+    async def load_artifact(self, *, app_name: str, user_id: str, session_id: str,
+                            filename: str, version: Optional[int] = None) -> Optional[types.Part]:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+        return await asyncio.to_thread(self._load, path, version)
+
+    async def list_artifact_keys(self, *, app_name: str, user_id: str, session_id: str) -> List[str]:
+        return await asyncio.to_thread(self._list_keys, app_name, user_id, session_id)
+
+    async def delete_artifact(self, *, app_name: str, user_id: str, session_id: str, filename: str) -> None:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+        await asyncio.to_thread(self._delete, path)
+
+    async def list_versions(self, *, app_name: str, user_id: str, session_id: str, filename: str) -> List[int]:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+        return await asyncio.to_thread(self._versions, path)
@@ -24,10 +24,19 @@ class Concert(BaseModel):
     venue: str = Field(description="The name of the venue where the event is held.")
     description: str = Field(description="A brief description of the event.")
 
+class PartialSection(BaseModel):
+    status: str = Field(description="'stale' (the last stored data, past its freshness window) or 'pending' (no data yet, retry later).")
+    reason: str = Field(description="'deadline' if the sub-agent ran out of time, 'error' if it failed.")
+    fetched_at: Optional[str] = Field(default=None, description="When stale data was fetched (ISO 8601).")
+
 # --- Master Schema for Final Validation ---
 class LocationData(BaseModel):
     """The master data model for all location information."""
     location: str = Field(description="The location for which the information was fetched.")
     movies: List[Movie]
     restaurants: Dict[str, List[Restaurant]] = Field(description="Contains keys 'veg_restaurants' and 'nonveg_restaurants'.")
-    concerts: List[Concert]
\ No newline at end of file
+    concerts: List[Concert]
+    partial_sections: Dict[str, PartialSection] = Field(
+        default_factory=dict,
+        description="Categories that did not finish in time, keyed by category. Empty when every section is current.",
+    )
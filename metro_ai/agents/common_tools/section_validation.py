@@ -0,0 +1,112 @@
+# agents/common_tools/section_validation.py
+import logging
+from typing import Any, Dict, List, Tuple
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from metropulse_common.json_repair import parse_number, repair_json
+from .schemas import Concert, Movie, Restaurant
+
+logger = logging.getLogger(__name__)
+
+
+def load_agent_json(text: Any) -> Any:
+    """
+    Parse a sub-agent's raw output, repairing common formatting slips locally
+    so only genuinely broken output reaches the LLM corrector. Raises
+    json.JSONDecodeError when nothing can be recovered.
+    """
+    if not text or not isinstance(text, str): return {}
+    result = repair_json(text)
+    if result.repairs:
+        logger.info(f"Repaired agent JSON locally: {', '.join(result.repairs)}")
+    return result.value
+
+def clean_restaurant_ratings(restaurant_list: list) -> list:
+    if not isinstance(restaurant_list, list): return []
+    for restaurant in restaurant_list:
+        rating = restaurant.get("rating")
+        if rating is not None:
+            restaurant["rating"] = parse_number(rating)
+        else: restaurant["rating"] = None
+    return restaurant_list
+
+
+# One adapter per key of a sub-agent's output, matching the LocationData fields
+_SECTION_ADAPTERS: Dict[str, Dict[str, TypeAdapter]] = {
+    "movies": {"movies": TypeAdapter(List[Movie])},
+    "restaurants": {
+        "veg_restaurants": TypeAdapter(List[Restaurant]),
+        "nonveg_restaurants": TypeAdapter(List[Restaurant]),
+    },
+    "concerts": {"concerts": TypeAdapter(List[Concert])},
+}
+
+
+def validate_category(category: str, raw_output: Any) -> Dict[str, list]:
+    """
+    Validate one sub-agent's output against its piece of the LocationData
+    schema. Accepts the raw output string or an already parsed dict.
+
+    Returns the validated section as plain data, shaped like the sub-agent
+    output (e.g. {"movies": [...]}). Raises ValidationError or
+    json.JSONDecodeError.
+    """
+    data = raw_output if isinstance(raw_output, dict) else load_agent_json(raw_output)
+    if not isinstance(data, dict):
+        data = {}
+    section = {}
+    for key, adapter in _SECTION_ADAPTERS[category].items():
+        items = data.get(key, [])
+        if category == "restaurants":
+            items = clean_restaurant_ratings(items)
+        section[key] = adapter.dump_python(adapter.validate_python(items), mode="json")
+    return section
+
+
+def category_sections(location_data: Dict[str, Any]) -> Dict[str, Dict[str, list]]:
+    """Split LocationData-shaped data into per-category sections shaped like the sub-agent outputs."""
+    restaurants = location_data.get("restaurants", {})
+    return {
+        "movies": {"movies": location_data.get("movies", [])},
+        "restaurants": {key: restaurants.get(key, []) for key in _SECTION_ADAPTERS["restaurants"]},
+        "concerts": {"concerts": location_data.get("concerts", [])},
+    }
+
+
+_ITEM_MODELS: Dict[str, type] = {"movies": Movie, "restaurants": Restaurant, "concerts": Concert}
+
+# (section key, original item, error message) for each item that failed validation
+InvalidItem = Tuple[str, Any, str]
+
+
+def _format_error(key: str, index: int, error: ValidationError) -> str:
+    details = "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'item'}: {err['msg']}" for err in error.errors()
+    )
+    return f"{key}[{index}]: {details}"
+
+
+def validate_section_items(category: str, data: Dict[str, Any]) -> Tuple[Dict[str, list], List[InvalidItem]]:
+    """
+    Validate a category's items one by one.
+
+    Returns the valid items per section key (as plain data) and the items
+    that failed, so only those need to be sent for repair.
+    """
+    model: BaseModel = _ITEM_MODELS[category]
+    valid: Dict[str, list] = {key: [] for key in _SECTION_ADAPTERS[category]}
+    invalid: List[InvalidItem] = []
+    for key in valid:
+        items = data.get(key, []) if isinstance(data, dict) else []
+        if not isinstance(items, list):
+            invalid.append((key, items, f"{key}: expected a list of objects"))
+            continue
+        for index, item in enumerate(items):
+            if category == "restaurants" and isinstance(item, dict):
+                clean_restaurant_ratings([item])
+            try:
+                valid[key].append(model.model_validate(item).model_dump(mode="json"))
+            except ValidationError as e:
+                invalid.append((key, item, _format_error(key, index, e)))
+    return valid, invalid
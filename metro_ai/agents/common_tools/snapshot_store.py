@@ -0,0 +1,186 @@
+# agents/common_tools/snapshot_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from .category_cache import CATEGORY_SPECS, normalize_location_key
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DB_PATH = os.getenv("SNAPSHOT_DB_PATH", "snapshots.db")
+# History older than this is pruned at startup; the latest snapshot per category is always kept
+SNAPSHOT_RETENTION_S = float(os.getenv("SNAPSHOT_RETENTION_S", str(30 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    location_key TEXT NOT NULL,
+    location_type TEXT NOT NULL,
+    location TEXT NOT NULL,
+    category TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_lookup
+    ON snapshots (location_key, location_type, category, fetched_at DESC);
+CREATE INDEX IF NOT EXISTS idx_snapshots_time
+    ON snapshots (location_key, location_type, fetched_at DESC);
+"""
+
+
+@dataclass
+class StoredSnapshot:
+    location: str
+    location_type: str
+    category: str
+    payload: Dict[str, Any]
+    fetched_at: float
+
+
+def _row_to_snapshot(row: sqlite3.Row) -> StoredSnapshot:
+    return StoredSnapshot(
+        location=row["location"], location_type=row["location_type"], category=row["category"],
+        payload=json.loads(row["payload"]), fetched_at=row["fetched_at"],
+    )
+
+
+class SnapshotStore:
+    """
+    Embedded SQLite history of validated category sections.
+
+    One row per (location, category, fetch), shaped like the sub-agent output
+    (the same payload CategoryCache holds), indexed by normalized location,
+    category and fetch time. Calls are synchronous and short; async callers
+    run them with asyncio.to_thread.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- writes ---
+
+    def put_many(self, location: str, location_type: str, sections: Dict[str, Dict[str, Any]],
+                 fetched_at: Optional[float] = None):
+        """Store several categories of one fetch in a single transaction."""
+        key, normalized_type = normalize_location_key(location, location_type)
+        fetched_at = fetched_at or time.time()
+        rows = [
+            (key, normalized_type, location, category, fetched_at, json.dumps(payload))
+            for category, payload in sections.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO snapshots (location_key, location_type, location, category, fetched_at, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def put(self, location: str, location_type: str, category: str, payload: Dict[str, Any],
+            fetched_at: Optional[float] = None):
+        self.put_many(location, location_type, {category: payload}, fetched_at)
+
+    def prune(self, older_than_s: float = SNAPSHOT_RETENTION_S) -> int:
+        """Delete history older than `older_than_s`, keeping each category's latest snapshot."""
+        cutoff = time.time() - older_than_s
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM snapshots WHERE fetched_at < ? AND fetched_at < ("
+                "  SELECT MAX(latest.fetched_at) FROM snapshots AS latest"
+                "  WHERE latest.location_key = snapshots.location_key"
+                "    AND latest.location_type = snapshots.location_type"
+                "    AND latest.category = snapshots.category)",
+                (cutoff,),
+            )
+        return cursor.rowcount
+
+    # --- reads ---
+
+    def latest(self, location: str, location_type: str = "city") -> Dict[str, StoredSnapshot]:
+        """The most recent snapshot of each category stored for the location."""
+        key, normalized_type = normalize_location_key(location, location_type)
+        snapshots = {}
+        with self._lock:
+            for category in CATEGORY_SPECS:
+                row = self._conn.execute(
+                    "SELECT * FROM snapshots WHERE location_key = ? AND location_type = ? AND category = ? "
+                    "ORDER BY fetched_at DESC LIMIT 1",
+                    (key, normalized_type, category),
+                ).fetchone()
+                if row is not None:
+                    snapshots[category] = _row_to_snapshot(row)
+        return snapshots
+
+    def history(self, location: str, location_type: str = "city", category: Optional[str] = None,
+                since: Optional[float] = None, until: Optional[float] = None,
+                limit: int = 100) -> List[StoredSnapshot]:
+        """Snapshots fetched in [since, until], newest first, optionally for one category."""
+        key, normalized_type = normalize_location_key(location, location_type)
+        query = "SELECT * FROM snapshots WHERE location_key = ? AND location_type = ?"
+        params: List[Any] = [key, normalized_type]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        if since is not None:
+            query += " AND fetched_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND fetched_at <= ?"
+            params.append(until)
+        query += " ORDER BY fetched_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_row_to_snapshot(row) for row in rows]
+
+    def iter_latest(self, limit: Optional[int] = None) -> Iterator[StoredSnapshot]:
+        """
+        The latest snapshot of every (location, category), most recently
+        fetched first and at most `limit` of them, e.g. to warm CategoryCache.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM snapshots WHERE fetched_at = ("
+                "  SELECT MAX(latest.fetched_at) FROM snapshots AS latest"
+                "  WHERE latest.location_key = snapshots.location_key"
+                "    AND latest.location_type = snapshots.location_type"
+                "    AND latest.category = snapshots.category)"
+                " ORDER BY fetched_at DESC LIMIT ?",
+                (-1 if limit is None else limit,),
+            ).fetchall()
+        for row in rows:
+            yield _row_to_snapshot(row)
+
+    def stats(self) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS snapshots, COUNT(DISTINCT location_key || '|' || location_type) AS locations "
+                "FROM snapshots"
+            ).fetchone()
+        return {"path": self.path, "snapshots": row["snapshots"], "locations": row["locations"]}
+
+
+def assemble_location_data(location: str, sections: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-category sections into LocationData-shaped data; missing categories come back empty."""
+    restaurants = sections.get("restaurants", {})
+    return {
+        "location": location,
+        "movies": sections.get("movies", {}).get("movies", []),
+        "restaurants": {key: restaurants.get(key, []) for key in CATEGORY_SPECS["restaurants"].section_keys},
+        "concerts": sections.get("concerts", {}).get("concerts", []),
+    }
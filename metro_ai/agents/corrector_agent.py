@@ -1,19 +1,31 @@
 # agents/corrector_agent.py
 from google.adk.agents import LlmAgent
 
-corrector_agent = LlmAgent(
-    name="CorrectorAgent",
-    model="gemini-2.0-flash", # A powerful model is needed for this reasoning task
-    description="Fixes a flawed JSON object based on a Pydantic validation error.",
-    instruction=(
-        "You are a data correction expert. You will be given a flawed JSON string "
-        "and a specific Pydantic validation error message. Your ONLY task is to "
-        "fix the JSON string so that it complies with the error message.\n"
-        "Do not add, remove, or hallucinate new information. Only correct the "
-        "structure and data types based on the error provided.\n"
-        "Return ONLY the corrected, raw JSON string, without any markdown or commentary.\n\n"
-        "Flawed JSON: {flawed_data}\n\n"
-        "Validation Error to Fix: {validation_error}"
-    ),
-    output_key="corrected_data" # The corrected JSON string
-)
\ No newline at end of file
+CORRECTOR_INSTRUCTION = (
+    "You are a data correction expert. You will be given a flawed JSON string "
+    "and a specific Pydantic validation error message. Your ONLY task is to "
+    "fix the JSON string so that it complies with the error message.\n"
+    "Do not add, remove, or hallucinate new information. Only correct the "
+    "structure and data types based on the error provided.\n"
+    "Return ONLY the corrected, raw JSON string, without any markdown or commentary.\n\n"
+    "Flawed JSON: {{{flawed_key}}}\n\n"
+    "Validation Error to Fix: {{{error_key}}}"
+)
+
+def create_corrector_agent(suffix: str = "") -> LlmAgent:
+    """
+    Builds a corrector whose state keys carry the given suffix, so several
+    correctors can repair independent sections concurrently in one session.
+    """
+    key_suffix = f"_{suffix}" if suffix else ""
+    return LlmAgent(
+        name=f"CorrectorAgent{suffix.title().replace('_', '')}",
+        model="gemini-2.0-flash", # A powerful model is needed for this reasoning task
+        description="Fixes a flawed JSON object based on a Pydantic validation error.",
+        instruction=CORRECTOR_INSTRUCTION.format(
+            flawed_key=f"flawed_data{key_suffix}", error_key=f"validation_error{key_suffix}",
+        ),
+        # The instruction carries the whole task; the session history would only add prompt tokens
+        include_contents="none",
+        output_key=f"corrected_data{key_suffix}" # The corrected JSON string
+    )
@@ -1,111 +1,224 @@
 # agents/final_processor_agent.py
 import json
 import logging
-import re
 import asyncio
+import os
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
 from google.adk.agents import BaseAgent, LlmAgent
 from google.adk.runners import InvocationContext
 from google.adk.events import Event
-from google.adk.artifacts import GcsArtifactService
 from google.genai import types
 from pydantic import ValidationError
 
 from .common_tools.schemas import LocationData
+from .common_tools.artifact_writer import ArtifactWriter
+from .common_tools.snapshot_store import SnapshotStore, assemble_location_data
+from .common_tools.category_cache import CATEGORY_SPECS, CategoryCache
+from .common_tools.section_validation import load_agent_json, validate_section_items
+from metropulse_common.telemetry import span
+from metropulse_common.token_usage import current_request_usage
 
 logger = logging.getLogger(__name__)
 
-# Helper functions remain the same and are correct
-def _extract_json(text: str) -> str:
-    if not text or not isinstance(text, str): return "{}"
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match: return match.group(0)
-    return "{}"
-
-def _clean_restaurant_ratings(restaurant_list: list) -> list:
-    if not isinstance(restaurant_list, list): return []
-    for restaurant in restaurant_list:
-        rating = restaurant.get("rating")
-        if rating is not None:
-            try: restaurant["rating"] = float(rating)
-            except (ValueError, TypeError): restaurant["rating"] = None
-        else: restaurant["rating"] = None
-    return restaurant_list
+MAX_REPAIR_ROUNDS = 2
+# Indent artifact JSON for human reading; API responses are always compact
+ARTIFACT_PRETTY_JSON = os.getenv("ARTIFACT_PRETTY_JSON", "false").lower() == "true"
+# The final event carries the validated LocationData, dumped to plain JSON
+# values, under this custom_metadata key so callers never parse the event text
+LOCATION_DATA_METADATA_KEY = "location_data"
+
+# Cumulative repair counters for this process
+repair_metrics = {
+    "runs": 0,
+    "runs_needing_repair": 0,
+    "corrector_calls": 0,
+    "corrector_rounds": 0,
+    "items_repaired": 0,
+    "items_dropped": 0,
+    "corrector_prompt_tokens": 0,
+    "corrector_output_tokens": 0,
+    "rounds_skipped_for_budget": 0,
+}
 
 class FinalProcessorAgent(BaseAgent):
-    artifact_service: GcsArtifactService
-    corrector_agent: LlmAgent
+    artifact_writer: ArtifactWriter
+    corrector_agents: Dict[str, LlmAgent]
+    category_cache: Optional[CategoryCache] = None
+    snapshot_store: Optional[SnapshotStore] = None
     class Config:
         arbitrary_types_allowed = True
 
+    async def _repair(self, ctx: InvocationContext, category: str, flawed: str, errors: List[str]) -> str:
+        """Runs this category's corrector over only the failing fragment and returns its raw output."""
+        ctx.session.state[f"flawed_data_{category}"] = flawed
+        ctx.session.state[f"validation_error_{category}"] = "\n".join(errors)
+        corrected_str = "{}"
+        with span("corrector", category):
+            async for event in self.corrector_agents[category].run_async(ctx):
+                usage = getattr(event, "usage_metadata", None)
+                if usage:
+                    repair_metrics["corrector_prompt_tokens"] += usage.prompt_token_count or 0
+                    repair_metrics["corrector_output_tokens"] += usage.candidates_token_count or 0
+                if event.is_final_response() and event.content and event.content.parts:
+                    corrected_str = event.content.parts[0].text or "{}"
+        return corrected_str
+
+    async def _validate_sections(self, ctx: InvocationContext) -> Dict[str, Dict[str, list]]:
+        """
+        Validates every category item by item, keeps the valid items and sends
+        only the failing fragments to the correctors, independent categories
+        concurrently. Items still invalid after MAX_REPAIR_ROUNDS are dropped.
+        """
+        sections: Dict[str, Dict[str, list]] = {}
+        # category -> (flawed JSON fragment, error messages)
+        pending: Dict[str, tuple] = {}
+
+        for category, spec in CATEGORY_SPECS.items():
+            raw = ctx.session.state.get(spec.output_key, '{}')
+            with span("validation", category, attempt=0):
+                try:
+                    data = load_agent_json(raw)
+                except json.JSONDecodeError as e:
+                    sections[category] = {key: [] for key in spec.section_keys}
+                    pending[category] = (raw, [f"Invalid JSON: {e}"])
+                    continue
+                sections[category], invalid = validate_section_items(category, data)
+            if invalid:
+                pending[category] = self._fragment(spec.section_keys, invalid)
+
+        repair_metrics["runs"] += 1
+        if pending:
+            repair_metrics["runs_needing_repair"] += 1
+
+        request_usage = current_request_usage()
+        for round_number in range(1, MAX_REPAIR_ROUNDS + 1):
+            if not pending:
+                break
+            # Repairs are optional: past the request's token budget, drop the flawed items instead
+            if request_usage is not None and request_usage.over_budget():
+                request_usage.skip("corrector_round")
+                repair_metrics["rounds_skipped_for_budget"] += 1
+                logger.warning(
+                    f"[{self.name}] Token budget spent ({request_usage.total.total_tokens}/{request_usage.budget}), "
+                    f"skipping repair round {round_number} for {sorted(pending)}"
+                )
+                break
+            logger.info(f"[{self.name}] Repair round {round_number}/{MAX_REPAIR_ROUNDS} for {sorted(pending)}")
+            categories = list(pending)
+            with span("corrector_round", self.name, round=round_number, categories=categories):
+                results = await asyncio.gather(
+                    *(self._repair(ctx, category, *pending[category]) for category in categories),
+                    return_exceptions=True,
+                )
+            repair_metrics["corrector_calls"] += len(categories)
+            repair_metrics["corrector_rounds"] += 1
+
+            next_pending = {}
+            for category, result in zip(categories, results):
+                spec = CATEGORY_SPECS[category]
+                if isinstance(result, Exception):
+                    # Transient model errors were already retried with backoff
+                    # underneath (see resilience.py); another round would only repeat them
+                    repair_metrics["items_dropped"] += max(1, len(pending[category][1]))
+                    logger.warning(f"[{self.name}] Corrector for {category} failed, dropping its flawed items: {result}")
+                    continue
+                with span("validation", category, attempt=round_number):
+                    try:
+                        corrected = load_agent_json(result)
+                    except json.JSONDecodeError as e:
+                        next_pending[category] = (result, [f"Invalid JSON: {e}"])
+                        continue
+                    repaired, invalid = validate_section_items(category, corrected)
+                for key, items in repaired.items():
+                    sections[category][key].extend(items)
+                    repair_metrics["items_repaired"] += len(items)
+                if invalid:
+                    next_pending[category] = self._fragment(spec.section_keys, invalid)
+            pending = next_pending
+
+        for category, (flawed, errors) in pending.items():
+            repair_metrics["items_dropped"] += max(1, len(errors))
+            logger.warning(f"[{self.name}] Dropping unrepairable {category} items: {errors}")
+
+        return sections
+
+    @staticmethod
+    def _fragment(section_keys, invalid) -> tuple:
+        fragment = {key: [] for key in section_keys}
+        for key, item, _ in invalid:
+            if isinstance(fragment.get(key), list):
+                fragment[key].append(item)
+        return json.dumps(fragment), [error for _, _, error in invalid]
+
     async def _run_async_impl(self, ctx: InvocationContext):
         logger.info(f"[{self.name}] Starting final processing...")
         final_message = ""
+        custom_metadata = None
         
         try:
-            movies_str = ctx.session.state.get("movies_info", '{}')
-            restaurants_str = ctx.session.state.get("restaurant_info", '{}')
-            concerts_str = ctx.session.state.get("concert_info", '{}')
             location = ctx.session.state.get("location", "unknown_location")
-            current_movies_data = json.loads(_extract_json(movies_str))
-            current_restaurants_data = json.loads(_extract_json(restaurants_str))
-            current_concerts_data = json.loads(_extract_json(concerts_str))
-            MAX_RETRIES = 3
-            for attempt in range(MAX_RETRIES):
-                logger.info(f"[{self.name}] Validation attempt {attempt + 1}/{MAX_RETRIES}...")
+            sections = await self._validate_sections(ctx)
+
+            # Sections whose sub-agent missed its deadline or failed, see SelectiveParallelAgent
+            partial = ctx.session.state.get("partial_categories", {})
+            validated_data = LocationData.model_validate(
+                {**assemble_location_data(location, sections), "partial_sections": partial}
+            )
+            logger.info(f"[{self.name}] Data validation successful! Repair metrics: {repair_metrics}")
+
+            # Only categories fetched in this run get a new snapshot timestamp
+            location_type = ctx.session.state.get("location_type", "city")
+            refreshed = ctx.session.state.get("refreshed_categories", list(CATEGORY_SPECS))
+            # An empty section (nothing found, or every item dropped) is not
+            # kept, or it would stand in for real data for the category's whole TTL
+            to_store = {category: sections[category] for category in refreshed if any(sections[category].values())}
+            if len(to_store) < len(refreshed):
+                logger.info(f"[{self.name}] Not caching empty sections for {location}: "
+                            f"{sorted(set(refreshed) - set(to_store))}")
+            fetched_at = time.time()
+            if self.category_cache is not None:
+                for category, section in to_store.items():
+                    self.category_cache.put(location, location_type, category, section, fetched_at)
+            if self.snapshot_store is not None and to_store:
                 try:
-                    # --- MODIFICATION 2: Use "location" as the key ---
-                    combined_data = {
-                        "location": location,
-                        "movies": current_movies_data.get("movies", []),
-                        "restaurants": { "veg_restaurants": current_restaurants_data.get("veg_restaurants", []), "nonveg_restaurants": current_restaurants_data.get("nonveg_restaurants", []) },
-                        "concerts": current_concerts_data.get("concerts", [])
-                    }
-                    combined_data["restaurants"]["veg_restaurants"] = _clean_restaurant_ratings(combined_data["restaurants"]["veg_restaurants"])
-                    combined_data["restaurants"]["nonveg_restaurants"] = _clean_restaurant_ratings(combined_data["restaurants"]["nonveg_restaurants"])
-
-                    # --- MODIFICATION 3: Validate against LocationData ---
-                    validated_data = LocationData.model_validate(combined_data)
-                    final_json_string = validated_data.model_dump_json(indent=2)
-                    logger.info(f"[{self.name}] Data validation successful!")
-
-                    final_message = final_json_string
-
-                    json_bytes = final_json_string.encode('utf-8')
-                    # This artifact structure is verified to be correct.
-                    artifact_to_save = types.Part(inline_data=types.Blob(
-                        mime_type="application/json",
-                        data=json_bytes
-                    ))
-                    
-                    # --- MODIFICATION 4: Use "location_data" for the GCS path ---
-                    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-                    filename = f"location_data/{location.lower().replace(' ', '_')}_{timestamp}.json"
-                    
-                    asyncio.create_task(self.artifact_service.save_artifact(
-                        app_name=ctx.app_name, user_id=ctx.user_id, session_id=ctx.session.id,
-                        filename=filename, artifact=artifact_to_save
-                    ))
-                    
-                    break 
-
-                except (ValidationError, json.JSONDecodeError) as e:
-                    logger.warning(f"[{self.name}] Validation failed on attempt {attempt + 1}. Error: {e}")
-                    if attempt < MAX_RETRIES - 1:
-                        logger.info(f"[{self.name}] Invoking CorrectorAgent...")
-                        ctx.session.state["flawed_data"] = json.dumps(combined_data)
-                        ctx.session.state["validation_error"] = str(e)
-                        async for _ in self.corrector_agent.run_async(ctx): pass
-                        corrected_str = ctx.session.state.get("corrected_data", '{}')
-                        corrected_json = json.loads(_extract_json(corrected_str))
-                        current_movies_data = corrected_json.get("movies", current_movies_data)
-                        current_restaurants_data = corrected_json.get("restaurants", current_restaurants_data)
-                        current_concerts_data = corrected_json.get("concerts", current_concerts_data)
-                    else:
-                        error_payload = {"status": "error", "message": f"Failed to validate data after {MAX_RETRIES} attempts. Final error: {e}"}
-                        final_message = json.dumps(error_payload)
-                        logger.error(f"[{self.name}] {final_message}")
+                    await asyncio.to_thread(
+                        self.snapshot_store.put_many, location, location_type, to_store, fetched_at,
+                    )
+                except Exception as e:
+                    logger.warning(f"[{self.name}] Failed to store snapshots for {location}: {e}")
+
+            restaurant_count = sum(len(items) for items in validated_data.restaurants.values())
+            final_message = (
+                f"LocationData ready for {location}: {len(validated_data.movies)} movies, "
+                f"{restaurant_count} restaurants, {len(validated_data.concerts)} concerts."
+            )
+            if partial:
+                statuses = ", ".join(f"{category} ({section['status']})" for category, section in sorted(partial.items()))
+                final_message += f" Partial: {statuses}."
+            custom_metadata = {LOCATION_DATA_METADATA_KEY: validated_data.model_dump(mode="json")}
 
+            json_bytes = validated_data.model_dump_json(indent=2 if ARTIFACT_PRETTY_JSON else None).encode('utf-8')
+            # This artifact structure is verified to be correct.
+            artifact_to_save = types.Part(inline_data=types.Blob(
+                mime_type="application/json",
+                data=json_bytes
+            ))
+            
+            # --- MODIFICATION 4: Use "location_data" for the GCS path ---
+            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            filename = f"location_data/{location.lower().replace(' ', '_')}_{timestamp}.json"
+            
+            await self.artifact_writer.submit(
+                app_name=ctx.app_name, user_id=ctx.user_id, session_id=ctx.session.id,
+                filename=filename, artifact=artifact_to_save
+            )
+
+        except ValidationError as e:
+            error_payload = {"status": "error", "message": f"Failed to validate data. Final error: {e}"}
+            final_message = json.dumps(error_payload)
+            logger.error(f"[{self.name}] {final_message}")
         except Exception as e:
             error_payload = {"status": "error", "message": f"An unexpected error occurred. Details: {e}"}
             final_message = json.dumps(error_payload)
@@ -113,4 +226,4 @@ class FinalProcessorAgent(BaseAgent):
             # Removed the incorrect 'break' statement here.
 
         final_content = types.Content(role="model", parts=[types.Part(text=final_message)])
-        yield Event(author=self.name, content=final_content)
\ No newline at end of file
+        yield Event(author=self.name, content=final_content, custom_metadata=custom_metadata)
\ No newline at end of file
@@ -1,28 +1,42 @@
 # agents/orchestrator_agent/agent.py
-from google.adk.agents import ParallelAgent, SequentialAgent
+from google.adk.agents import SequentialAgent
 from agents.movie_agent.agent import movie_agent
 from agents.restaurant_agent.agent import restaurant_agent
 from agents.concert_agent.agent import concert_agent
 from agents.final_processor_agent import FinalProcessorAgent
-from agents.corrector_agent import corrector_agent # <-- Import the new corrector
+from agents.corrector_agent import create_corrector_agent # <-- Import the new corrector
+from agents.selective_parallel_agent import SelectiveParallelAgent
+from agents.common_tools.category_cache import CategoryCache, CATEGORY_SPECS
+from metropulse_common.telemetry import instrument_model_calls
 
-def create_metro_pulse_agent(artifact_service):
+def create_metro_pulse_agent(artifact_writer, category_cache=None, snapshot_store=None):
     """
     Creates the main agent workflow with a Python-first, LLM-fallback processor.
     """
-    # STEP 1: Gather data concurrently.
-    parallel_data_gatherer = ParallelAgent(
+    category_cache = category_cache or CategoryCache()
+
+    # STEP 1: Gather data concurrently, only for categories that are stale.
+    parallel_data_gatherer = SelectiveParallelAgent(
         name="ParallelLocationDataGatherer",
         sub_agents=[movie_agent, restaurant_agent, concert_agent],
+        category_cache=category_cache,
     )
 
-    # STEP 2: The final processing step, now with the corrector injected.
+    # STEP 2: The final processing step, with one corrector per category so
+    # independent sections can be repaired concurrently.
+    corrector_agents = {category: create_corrector_agent(category) for category in CATEGORY_SPECS}
     final_processor = FinalProcessorAgent(
         name="FinalProcessorAgent",
-        artifact_service=artifact_service,
-        corrector_agent=corrector_agent # <-- Inject the dependency
+        artifact_writer=artifact_writer,
+        corrector_agents=corrector_agents, # <-- Inject the dependency
+        category_cache=category_cache,
+        snapshot_store=snapshot_store,
     )
 
+    # Time every model call (search-grounded or not) per agent
+    for agent in [movie_agent, restaurant_agent, concert_agent, *corrector_agents.values()]:
+        instrument_model_calls(agent)
+
     # The root agent that runs the two steps in order.
     root_agent = SequentialAgent(
         name="MetroPulsePipeline",
@@ -0,0 +1,176 @@
+# agents/selective_parallel_agent.py
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import AsyncGenerator, List, Optional, Tuple, Union
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+
+from .common_tools.category_cache import CATEGORY_SPECS, CategoryCache
+from metropulse_common.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+_RUN_DONE = object()
+
+
+class _RunMissed:
+    """Queued in place of a sub-agent's remaining events when it misses its deadline or fails."""
+
+    def __init__(self, agent_name: str, reason: str, error: Optional[Exception] = None):
+        self.agent_name = agent_name
+        self.reason = reason  # "deadline" or "error"
+        self.error = error
+
+
+async def _timed_run(agent: BaseAgent, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+    with span("sub_agent", agent.name):
+        async for event in agent.run_async(ctx):
+            yield event
+
+
+async def _merge_runs(runs: List[Tuple[str, AsyncGenerator[Event, None], float]]
+                      ) -> AsyncGenerator[Union[Event, _RunMissed], None]:
+    """
+    Interleave events from concurrently running sub-agents as they arrive.
+    A run still going after its deadline (seconds, 0 for none) is cancelled,
+    and it and a run that raises are reported with a _RunMissed item instead
+    of failing the others.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump(run):
+        async for event in run:
+            await queue.put(event)
+
+    async def drain(agent_name, run, deadline_s):
+        try:
+            # wait_for runs the whole generator in one task, so its context
+            # managers enter and exit in the same context
+            await (asyncio.wait_for(pump(run), deadline_s) if deadline_s > 0 else pump(run))
+            await queue.put(_RUN_DONE)
+        except asyncio.TimeoutError:
+            await queue.put(_RunMissed(agent_name, "deadline"))
+        except Exception as e:
+            await queue.put(_RunMissed(agent_name, "error", e))
+
+    tasks = [asyncio.create_task(drain(*run)) for run in runs]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is _RUN_DONE:
+                remaining -= 1
+            elif isinstance(item, _RunMissed):
+                remaining -= 1
+                yield item
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class SelectiveParallelAgent(BaseAgent):
+    """
+    Parallel data gatherer that only runs the sub-agents whose category is
+    stale for the requested location.
+
+    Fresh categories are served from the CategoryCache by writing the cached
+    section into the sub-agent's output_key (through an event state_delta),
+    so FinalProcessorAgent sees the same state shape either way. The names
+    of the categories that were actually fetched are left in
+    state["refreshed_categories"].
+
+    Each sub-agent gets its category's deadline_s. One that runs out of time
+    or fails is cancelled and its category is served from the last stored
+    snapshot ("stale") or left empty ("pending"), recorded in
+    state["partial_categories"], so one slow search cannot hold up the rest.
+    """
+    category_cache: CategoryCache
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        location = ctx.session.state.get("location", "unknown_location")
+        location_type = ctx.session.state.get("location_type", "city")
+        agents_by_name = {agent.name: agent for agent in self.sub_agents}
+
+        stale_agents, refreshed, cached, state_delta = [], [], [], {}
+        for category, spec in CATEGORY_SPECS.items():
+            agent = agents_by_name.get(spec.agent_name)
+            if agent is None:
+                continue
+            snapshot = self.category_cache.get_fresh(location, location_type, category)
+            if snapshot is not None:
+                state_delta[spec.output_key] = json.dumps(snapshot.payload)
+                cached.append(category)
+            else:
+                stale_agents.append(agent)
+                refreshed.append(category)
+
+        state_delta["refreshed_categories"] = refreshed
+        state_delta["cached_categories"] = cached
+        logger.info(f"[{self.name}] {location}: refreshing {refreshed or 'nothing'}, cached {cached or 'nothing'}")
+        # Emitted as an event so cached sections land in state the same way
+        # a sub-agent's output_key does, and are visible to streaming readers
+        yield Event(
+            invocation_id=ctx.invocation_id, author=self.name, branch=ctx.branch,
+            actions=EventActions(state_delta=state_delta),
+        )
+
+        if not stale_agents:
+            return
+
+        # Give each sub-agent its own branch, as ParallelAgent does, so they
+        # do not see each other's conversation history.
+        categories_by_agent = {CATEGORY_SPECS[category].agent_name: category for category in refreshed}
+        runs = []
+        for agent in stale_agents:
+            branch = f"{ctx.branch}.{agent.name}" if ctx.branch else f"{self.name}.{agent.name}"
+            deadline_s = CATEGORY_SPECS[categories_by_agent[agent.name]].deadline_s
+            runs.append((agent.name, _timed_run(agent, ctx.model_copy(update={"branch": branch})), deadline_s))
+
+        missed: List[_RunMissed] = []
+        async for item in _merge_runs(runs):
+            if isinstance(item, _RunMissed):
+                missed.append(item)
+            else:
+                yield item
+        if not missed:
+            return
+
+        partial, state_delta = {}, {}
+        for run in missed:
+            category = categories_by_agent[run.agent_name]
+            snapshot = self.category_cache.get(location, location_type, category)
+            if run.reason == "deadline":
+                logger.warning(f"[{self.name}] {run.agent_name} missed its {CATEGORY_SPECS[category].deadline_s:g}s "
+                               f"deadline for {location}")
+            else:
+                logger.warning(f"[{self.name}] {run.agent_name} failed for {location}: {run.error}")
+            if snapshot is not None:
+                state_delta[CATEGORY_SPECS[category].output_key] = json.dumps(snapshot.payload)
+                fetched_at = datetime.fromtimestamp(snapshot.fetched_at, tz=timezone.utc).isoformat()
+                partial[category] = {"status": "stale", "reason": run.reason, "fetched_at": fetched_at}
+            else:
+                partial[category] = {"status": "pending", "reason": run.reason}
+
+        # Nothing at all to serve: surface the failure rather than an empty response
+        errors = [run.error for run in missed if run.error is not None]
+        served = cached or len(missed) < len(stale_agents) or any(
+            section["status"] == "stale" for section in partial.values())
+        if errors and not served:
+            raise errors[0]
+
+        # Missed categories must not be cached as if they had been fetched
+        state_delta["refreshed_categories"] = [category for category in refreshed if category not in partial]
+        state_delta["partial_categories"] = partial
+        yield Event(
+            invocation_id=ctx.invocation_id, author=self.name, branch=ctx.branch,
+            actions=EventActions(state_delta=state_delta),
+        )
@@ -0,0 +1,130 @@
+# bench_json_repair.py
+"""
+Repair success rate and parse time of the local JSON repairer against the
+old greedy-regex extraction, over a corpus of malformed agent outputs.
+
+The default corpus is built by injecting common LLM formatting slips into
+well-formed sub-agent outputs. A recorded corpus can be supplied instead as
+JSONL lines of {"raw": "<agent output>", "expected": <parsed value>}.
+
+    python bench_json_repair.py --repeat 200
+    python bench_json_repair.py --corpus recorded_outputs.jsonl
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+from collections import defaultdict
+
+from metropulse_common.json_repair import repair_json
+
+SAMPLES = [
+    {"movies": [
+        {"title": "Dune: Part Two", "genre": "Sci-Fi", "theatres": ["PVR Orion", "INOX Garuda"], "rating": 8.6},
+        {"title": "Laapataa Ladies", "genre": "Comedy", "theatres": ["Cinepolis"], "rating": 8.4},
+    ]},
+    {"veg_restaurants": [
+        {"name": "Vidyarthi Bhavan", "cuisine": "South Indian", "address": "Gandhi Bazaar", "rating": 4.5},
+    ], "nonveg_restaurants": [
+        {"name": "Meghana Foods", "cuisine": "Andhra", "address": "Residency Rd, \"Koramangala\"", "rating": 4.3},
+    ]},
+    {"concerts": [
+        {"name": "Prateek Kuhad Live", "venue": "Phoenix Arena", "date": "2026-11-02", "price": None},
+    ]},
+]
+
+
+def _strip_last(text: str, char: str) -> str:
+    i = text.rfind(char)
+    return text[:i] + text[i + 1:]
+
+
+# name -> defect injector
+DEFECTS = {
+    "clean": lambda s: s,
+    "code_fence": lambda s: f"```json\n{s}\n```",
+    "prose_around": lambda s: f"Here is the data you asked for:\n{s}\nLet me know if you need more!",
+    "trailing_commas": lambda s: re.sub(r"([\]}\"\d])(\s*[\]}])", r"\1,\2", s),
+    "single_quotes": lambda s: s.replace('\\"', "\u0000").replace('"', "'").replace("\u0000", '"'),
+    "comments": lambda s: "// results from search\n" + s.replace("[", "[ /* list */", 1),
+    "python_literals": lambda s: s.replace("null", "None"),
+    "truncated": lambda s: s[: int(len(s) * 0.8)],
+    "missing_bracket": lambda s: _strip_last(s, "]"),
+    "rating_strings": lambda s: re.sub(r'"rating": ([\d.]+)', r'"rating": "\1/5"', s),
+    "two_objects": lambda s: s + "\n" + s,
+}
+
+
+def build_corpus():
+    corpus = []
+    for sample in SAMPLES:
+        text = json.dumps(sample, indent=2)
+        for defect, inject in DEFECTS.items():
+            corpus.append((defect, inject(text), sample))
+    return corpus
+
+
+def load_corpus(path: str):
+    with open(path) as f:
+        return [("recorded", row["raw"], row.get("expected")) for row in map(json.loads, f) if row]
+
+
+def greedy_regex(text: str):
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    return json.loads(match.group(0) if match else "{}")
+
+
+def local_repair(text: str):
+    return repair_json(text).value
+
+
+def _matches(value, expected, defect: str) -> bool:
+    if expected is None:
+        return True
+    if defect == "truncated":
+        # Truncated output cannot be recovered in full; a parsed prefix is a success
+        return isinstance(value, dict) and set(value) <= set(expected)
+    return value == expected
+
+
+def bench(corpus, parser, repeat: int):
+    ok, times = defaultdict(lambda: [0, 0]), []
+    for defect, raw, expected in corpus:
+        success = False
+        start = time.perf_counter()
+        for _ in range(repeat):
+            try:
+                value = parser(raw)
+                success = _matches(value, expected, defect)
+            except (json.JSONDecodeError, ValueError):
+                success = False
+        times.append((time.perf_counter() - start) / repeat * 1e6)
+        ok[defect][0] += success
+        ok[defect][1] += 1
+    return ok, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL file of recorded agent outputs")
+    parser.add_argument("--repeat", type=int, default=100, help="parses per corpus entry for timing")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus()
+    results = {name: bench(corpus, fn, args.repeat) for name, fn in
+               (("greedy_regex", greedy_regex), ("local_repair", local_repair))}
+
+    defects = list(dict.fromkeys(defect for defect, _, _ in corpus))
+    print(f"{'defect':<18}" + "".join(f"{name:>16}" for name in results))
+    for defect in defects:
+        print(f"{defect:<18}" + "".join(f"{ok[defect][0]:>12}/{ok[defect][1]:<3}" for ok, _ in results.values()))
+    print()
+    for name, (ok, times) in results.items():
+        passed = sum(v[0] for v in ok.values())
+        print(f"{name:<14} success {passed}/{len(corpus)} ({passed / len(corpus):.0%})  "
+              f"parse time p50 {statistics.median(times):.1f}us  max {max(times):.1f}us")
+
+
+if __name__ == "__main__":
+    main()
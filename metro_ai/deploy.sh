@@ -43,6 +43,12 @@ gcloud projects add-iam-policy-binding $PROJECT_ID \
     --condition=None > /dev/null
 
 echo "[INFO] IAM permissions are set."
+
+# The image imports the shared package from the build context; copy it in for this deploy only
+echo "[INFO] Staging the shared metropulse_common package..."
+rm -rf metropulse_common
+cp -r ../common/metropulse_common metropulse_common
+trap 'rm -rf metropulse_common' EXIT
 echo "[INFO] Starting Cloud Run deployment for service '$SERVICE_NAME'..."
 
 # This command passes all necessary environment variables for the application
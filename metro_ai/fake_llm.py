@@ -0,0 +1,90 @@
+# fake_llm.py
+"""
+MetroPulse responders for the offline fake LLM (metropulse_common.fake_llm),
+which stands in for Gemini when LLM_BACKEND=fake.
+"""
+import json
+import random
+from typing import Optional
+
+from google.adk.models import BaseLlm
+
+from metropulse_common.fake_llm import FakeLlm, FakeLlmProfile, filler_text
+from metropulse_common.model_wrappers import ModelWrapper
+
+def _movies(rng: random.Random, profile: FakeLlmProfile, count: int) -> list:
+    return [{
+        "name": f"Movie {rng.randint(1, 10_000)}",
+        "genre": rng.choice(["Drama", "Comedy", "Thriller", "Sci-Fi"]),
+        "compatible_mbti": rng.sample(["INTJ", "INFP", "ENFP", "ISTJ", "ENTP"], 2),
+        "language": rng.choice(["English", "Hindi", "Kannada"]),
+        "certificate": rng.choice(["U", "UA", "A"]),
+        "description": filler_text(rng, profile.text_chars),
+        "locations_available": {f"Theatre {t}": ["10:00", "14:30", "21:15"] for t in range(rng.randint(1, 4))},
+    } for _ in range(count)]
+
+
+def _restaurants(rng: random.Random, profile: FakeLlmProfile, count: int) -> list:
+    return [{
+        "name": f"Restaurant {rng.randint(1, 10_000)}",
+        "cuisine": rng.choice(["South Indian", "Italian", "Chinese", "Andhra"]),
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "address": filler_text(rng, profile.text_chars // 4),
+    } for _ in range(count)]
+
+
+def _concerts(rng: random.Random, profile: FakeLlmProfile, count: int) -> list:
+    return [{
+        "name": f"Concert {rng.randint(1, 10_000)}",
+        "date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "venue": f"Venue {rng.randint(1, 50)}",
+        "description": filler_text(rng, profile.text_chars),
+    } for _ in range(count)]
+
+
+def movies_responder(rng, profile, llm_request) -> str:
+    return json.dumps({"movies": _movies(rng, profile, profile.items)})
+
+
+def restaurants_responder(rng, profile, llm_request) -> str:
+    half = max(1, profile.items // 2)
+    return json.dumps({"veg_restaurants": _restaurants(rng, profile, half),
+                       "nonveg_restaurants": _restaurants(rng, profile, half)})
+
+
+def concerts_responder(rng, profile, llm_request) -> str:
+    return json.dumps({"concerts": _concerts(rng, profile, profile.items)})
+
+
+def corrector_responder(rng, profile, llm_request) -> str:
+    """Answers with valid items for whichever section keys the flawed fragment mentions."""
+    instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+    fixed = {}
+    if '"movies"' in instruction:
+        fixed["movies"] = _movies(rng, profile, 1)
+    for key in ("veg_restaurants", "nonveg_restaurants"):
+        if f'"{key}"' in instruction:
+            fixed[key] = _restaurants(rng, profile, 1)
+    if '"concerts"' in instruction:
+        fixed["concerts"] = _concerts(rng, profile, 1)
+    return json.dumps(fixed)
+
+
+_RESPONDERS = {
+    "MovieAgent": movies_responder,
+    "RestaurantAgent": restaurants_responder,
+    "ConcertAgent": concerts_responder,
+}
+
+
+def fake_llm_wrapper(profile: FakeLlmProfile = None) -> ModelWrapper:
+    """Puts the pipeline's LlmAgents onto a FakeLlm, keeping the model names."""
+    profile = profile or FakeLlmProfile()
+
+    def wrap(agent_name: str, inner: BaseLlm) -> Optional[FakeLlm]:
+        responder = corrector_responder if agent_name.startswith("CorrectorAgent") else _RESPONDERS.get(agent_name)
+        if responder is None:
+            return None
+        return FakeLlm(model=inner.model, responder=responder, profile=profile)
+
+    return wrap
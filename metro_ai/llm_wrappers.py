@@ -0,0 +1,41 @@
+# llm_wrappers.py
+"""
+Swaps the model of every LlmAgent in the pipeline for a wrapper around it:
+the offline fake, the cassette, the model limiter and retries (see
+metropulse_common). Each feature supplies only its wrapper; wrap_models
+walks the agents.
+
+Wrappers applied later sit outside earlier ones, so calls pass through them
+first: main.py installs retries after the limiter so that a call backing off
+between attempts does not hold a slot.
+"""
+from typing import Iterator
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.models import BaseLlm
+from google.adk.models.registry import LLMRegistry
+
+from metropulse_common.model_wrappers import ModelWrapper
+
+
+def llm_agents(agent: BaseAgent) -> Iterator[LlmAgent]:
+    """Every LlmAgent in the tree under `agent`."""
+    if isinstance(agent, LlmAgent):
+        yield agent
+    for sub_agent in agent.sub_agents:
+        yield from llm_agents(sub_agent)
+    # FinalProcessorAgent keeps its correctors outside sub_agents
+    for corrector in getattr(agent, "corrector_agents", {}).values():
+        yield from llm_agents(corrector)
+
+
+def wrap_models(root_agent: BaseAgent, wrapper: ModelWrapper) -> int:
+    """Replace each LlmAgent's model with `wrapper(agent.name, model)`; returns how many were replaced."""
+    wrapped = 0
+    for agent in llm_agents(root_agent):
+        inner = agent.model if isinstance(agent.model, BaseLlm) else LLMRegistry.new_llm(agent.model)
+        model = wrapper(agent.name, inner)
+        if model is not None:
+            agent.model = model
+            wrapped += 1
+    return wrapped
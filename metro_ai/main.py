@@ -1,15 +1,21 @@
 # main.py
 import os
 import asyncio
+import hmac
 import logging
 from contextlib import asynccontextmanager
 import json
+import time
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from datetime import datetime, timezone
+from typing import Optional
+from pydantic import BaseModel, Field
 # --- ADD THIS IMPORT ---
 from fastapi.middleware.cors import CORSMiddleware
 # -----------------------
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
 
 from dotenv import load_dotenv
 
@@ -19,12 +25,40 @@ from google.adk.artifacts import GcsArtifactService
 from google.genai import types
 from agents.common_tools.schemas import LocationData
 from agents.orchestrator_agent.agent import create_metro_pulse_agent
+from agents.common_tools.category_cache import CategoryCache, CATEGORY_SPECS, normalize_location_key
+from agents.common_tools.section_validation import validate_category, category_sections
+from agents.final_processor_agent import LOCATION_DATA_METADATA_KEY
+from agents.common_tools.artifact_writer import ArtifactWriter
+from agents.common_tools.local_artifact_service import LocalArtifactService
+from agents.common_tools.snapshot_store import SnapshotStore, assemble_location_data, SNAPSHOT_DB_PATH
+from metropulse_common.telemetry import (
+    STAGE_SECONDS, configure_service, configure_tracing, observe_request_usage, render_metrics, shutdown_tracing, span,
+)
+from metropulse_common.token_usage import track_request, usage_totals
+from response_cache import (
+    MISS, ResponseCache,
+    LOCATION_CACHE_TTL_S, LOCATION_CACHE_STALE_S, LOCATION_CACHE_MAX_ENTRIES,
+)
+from prewarm_scheduler import PrewarmScheduler, PREWARM_ENABLED, PREWARM_MAX_TOP_N
+from llm_wrappers import wrap_models
+from fake_llm import fake_llm_wrapper
+from metropulse_common.fake_llm import LLM_BACKEND
+from metropulse_common.cassette import CASSETTE_MODE, cassette_wrapper
+from metropulse_common.model_limiter import MODEL_LIMITER_ENABLED, ModelLimiter, ModelOverloadedError, rate_limited_wrapper
+from metropulse_common.resilience import RESILIENCE_ENABLED, TRANSIENT, CircuitOpenError, classify, resilience_stats, resilient_wrapper
 
 # Only load .env for local development
 if "K_SERVICE" not in os.environ:
     print("Running locally, loading .env file...")
     load_dotenv()
 
+# "gcs" (default) or "local" to keep artifacts on disk, e.g. for local runs and tests
+ARTIFACT_BACKEND = os.getenv("ARTIFACT_BACKEND", "gcs").lower()
+ARTIFACT_LOCAL_DIR = os.getenv("ARTIFACT_LOCAL_DIR", "artifacts")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/metro_pulse.jsonl.gz")
+
+configure_service("metro_pulse", "metro-pulse")
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -33,25 +67,60 @@ class LocationInfoRequest(BaseModel):
     # You had this in the previous version, it's good practice to keep it
     location_type: str = "city" 
 
+class PrewarmCommand(BaseModel):
+    action: str  # "start", "stop" or "run_now"
+    top_n: Optional[int] = Field(default=None, ge=1, le=PREWARM_MAX_TOP_N)
+
 app_state = {}
 
+CATEGORY_BY_OUTPUT_KEY = {spec.output_key: category for category, spec in CATEGORY_SPECS.items()}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application startup... Initializing ADK Runner.")
+    configure_tracing()
     
     # The libraries will now automatically pick up the environment variables
     # set by the deploy.sh script. No explicit init call is needed.
     
-    BUCKET = os.getenv("GOOGLE_CLOUD_STAGING_BUCKET")
-    if not BUCKET:
-        raise ValueError("FATAL: GOOGLE_CLOUD_STAGING_BUCKET environment variable not set.")
-    
-    bucket_name = BUCKET[5:] if BUCKET.startswith("gs://") else BUCKET
-    logger.info(f"Using GCS bucket: {bucket_name}")
-    
-    artifact_service = GcsArtifactService(bucket_name=bucket_name)
+    if ARTIFACT_BACKEND == "local":
+        logger.info(f"Using local artifact directory: {ARTIFACT_LOCAL_DIR}")
+        artifact_service = LocalArtifactService(ARTIFACT_LOCAL_DIR)
+    else:
+        BUCKET = os.getenv("GOOGLE_CLOUD_STAGING_BUCKET")
+        if not BUCKET:
+            raise ValueError("FATAL: GOOGLE_CLOUD_STAGING_BUCKET environment variable not set.")
+
+        bucket_name = BUCKET[5:] if BUCKET.startswith("gs://") else BUCKET
+        logger.info(f"Using GCS bucket: {bucket_name}")
+        artifact_service = GcsArtifactService(bucket_name=bucket_name)
+
+    artifact_writer = ArtifactWriter(artifact_service)
+    artifact_writer.start()
     session_service = InMemorySessionService()
-    metro_pulse_agent = create_metro_pulse_agent(artifact_service=artifact_service)
+    category_cache = CategoryCache()
+    snapshot_store = SnapshotStore(SNAPSHOT_DB_PATH)
+    pruned = snapshot_store.prune()
+    # Categories fetched before a restart are still fresh, no need to fetch them again.
+    # Only the most recent ones are warmed, oldest first so they end up most recently used
+    for snapshot in reversed(list(snapshot_store.iter_latest(limit=category_cache.max_entries))):
+        category_cache.put(snapshot.location, snapshot.location_type, snapshot.category,
+                           snapshot.payload, snapshot.fetched_at)
+    logger.info(f"Snapshot store ready at {SNAPSHOT_DB_PATH} ({pruned} old snapshots pruned).")
+    metro_pulse_agent = create_metro_pulse_agent(
+        artifact_writer=artifact_writer, category_cache=category_cache, snapshot_store=snapshot_store,
+    )
+    if LLM_BACKEND == "fake":
+        logger.warning("LLM_BACKEND=fake: all model calls are served by the offline fake LLM.")
+        wrap_models(metro_pulse_agent, fake_llm_wrapper())
+    if CASSETTE_MODE in ("record", "replay"):
+        # Applied after the fake, so a fake run can be recorded too
+        wrap_models(metro_pulse_agent, cassette_wrapper(CASSETTE_PATH))
+    model_limiter = ModelLimiter()
+    if MODEL_LIMITER_ENABLED:
+        wrap_models(metro_pulse_agent, rate_limited_wrapper(model_limiter))
+    if RESILIENCE_ENABLED:
+        wrap_models(metro_pulse_agent, resilient_wrapper())
     
     runner = Runner(
         app_name="MetroPulseApp",
@@ -62,11 +131,29 @@ async def lifespan(app: FastAPI):
     
     app_state["runner"] = runner
     app_state["session_service"] = session_service
+    app_state["category_cache"] = category_cache
+    app_state["artifact_writer"] = artifact_writer
+    app_state["snapshot_store"] = snapshot_store
+    app_state["model_limiter"] = model_limiter
+    app_state["response_cache"] = ResponseCache(
+        ttl_s=LOCATION_CACHE_TTL_S, stale_s=LOCATION_CACHE_STALE_S, max_entries=LOCATION_CACHE_MAX_ENTRIES,
+        # A partial response is not kept, so the next request fetches the missing sections again
+        cacheable=lambda location_data: not location_data.partial_sections,
+    )
+    prewarm_scheduler = PrewarmScheduler(app_state["response_cache"], run_location_pipeline)
+    app_state["prewarm_scheduler"] = prewarm_scheduler
+    if PREWARM_ENABLED:
+        prewarm_scheduler.start()
     logger.info("ADK Runner initialized successfully.")
     
     yield
     
     logger.info("Application shutdown.")
+    await prewarm_scheduler.stop()
+    # Flush pending artifact writes before the process exits
+    await artifact_writer.stop()
+    snapshot_store.close()
+    shutdown_tracing()
     app_state.clear()
 
 app = FastAPI(lifespan=lifespan)
@@ -84,12 +171,23 @@ app.add_middleware(
 # ----------------------------------------
 
 
-@app.post("/get-location-info",  response_model=LocationData)
-async def get_location_info(request: LocationInfoRequest):
-    location_name = request.location
-    location_type = request.location_type # Capture this from the request
-    logger.info(f"Received request for {location_type}: {location_name}")
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await call_next(request)
+        outcome = str(response.status_code)
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the series count bounded
+        route = request.scope.get("route")
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="http",
+                              name=f"{request.method} {route.path if route else 'unmatched'}", outcome=outcome)
 
+
+async def iter_pipeline_events(location_name: str, location_type: str):
+    """Runs the MetroPulsePipeline for one location in a fresh session, yielding its ADK events."""
     runner = app_state.get("runner")
     session_service = app_state.get("session_service")
     if not runner or not session_service:
@@ -98,37 +196,367 @@ async def get_location_info(request: LocationInfoRequest):
     user_id = f"api_user_{location_name.lower().replace(' ', '_')}"
     session_id = f"api_session_{location_name.lower().replace(' ', '_')}_{os.urandom(8).hex()}"
 
-    try:
-        # Pass both location and type to the agent's state
-        session = await session_service.create_session(
-            app_name="MetroPulseApp", user_id=user_id, session_id=session_id, 
-            state={"location": location_name, "location_type": location_type}
-        )
-        
-        content = types.Content(role="user", parts=[types.Part(text=f"Get info for {location_name}")])
+    # Pass both location and type to the agent's state
+    session = await session_service.create_session(
+        app_name="MetroPulseApp", user_id=user_id, session_id=session_id, 
+        state={"location": location_name, "location_type": location_type}
+    )
+    
+    content = types.Content(role="user", parts=[types.Part(text=f"Get info for {location_name}")])
 
-        final_message_str = "Agent did not produce a final response."
+    with span("pipeline", runner.agent.name, location=location_name), track_request() as request_usage:
         async for event in runner.run_async(
             user_id=user_id, session_id=session.id, new_message=content
         ):
+            yield event
+
+    location_key = " / ".join(normalize_location_key(location_name, location_type))
+    usage_totals.record_request(location_key, request_usage)
+    observe_request_usage(request_usage)
+    logger.info(f"Token usage for {location_key}: {request_usage.to_dict()}")
+
+
+def parse_final_message(location_name: str, final_event) -> LocationData:
+    """
+    Returns the LocationData carried in the pipeline's final event metadata.
+    Failures arrive as a JSON error payload in the event text instead.
+    """
+    if final_event is None:
+        raise HTTPException(status_code=500, detail="Agent did not produce a final response.")
+    location_data = (final_event.custom_metadata or {}).get(LOCATION_DATA_METADATA_KEY)
+    if location_data is not None:
+        return LocationData.model_validate(location_data)
+
+    final_message_str = final_event.content.parts[0].text
+    response_data = json.loads(final_message_str)
+    if isinstance(response_data, dict) and response_data.get("status") == "error":
+        logger.error(f"Agent pipeline failed for {location_name}: {response_data.get('message')}")
+        raise HTTPException(status_code=500, detail=response_data.get("message"))
+    return LocationData.model_validate(response_data)
+
+
+def overloaded_error(e: ModelOverloadedError) -> HTTPException:
+    return HTTPException(status_code=429, detail=f"Model capacity exhausted: {e}",
+                         headers={"Retry-After": str(e.retry_after)})
+
+
+def check_model_admission():
+    """Refuse a pipeline run up front, rather than part-way through, when model calls are backed up."""
+    if MODEL_LIMITER_ENABLED:
+        try:
+            app_state["model_limiter"].check_admission()
+        except ModelOverloadedError as e:
+            raise overloaded_error(e)
+
+
+async def run_location_pipeline(location_name: str, location_type: str,
+                                events: Optional[asyncio.Queue] = None) -> LocationData:
+    """
+    Runs the full MetroPulsePipeline for one location and returns the
+    validated LocationData. With `events`, every pipeline event is also put
+    on the queue, followed by None once the run ends.
+    """
+    final_event = None
+    check_model_admission()
+    try:
+        async for event in iter_pipeline_events(location_name, location_type):
+            if events is not None:
+                events.put_nowait(event)
             if event.is_final_response() and event.content and event.content.parts:
-                final_message_str = event.content.parts[0].text
+                final_event = event
         
-        response_data = json.loads(final_message_str)
-
-        if isinstance(response_data, dict) and response_data.get("status") == "error":
-            logger.error(f"Agent pipeline failed for {location_name}: {response_data.get('message')}")
-            raise HTTPException(status_code=500, detail=response_data.get("message"))
+        location_data = parse_final_message(location_name, final_event)
 
         logger.info(f"Successfully processed request for {location_name}.")
-        return response_data
+        return location_data
 
-    except json.JSONDecodeError:
-        logger.error(f"Failed to parse the final agent response: {final_message_str}")
+    except HTTPException:
+        raise
+    except ModelOverloadedError as e:
+        logger.warning(f"Model calls for {location_name} refused: {e}")
+        raise overloaded_error(e)
+    except CircuitOpenError as e:
+        # Sections with stored snapshots were already served stale; nothing was left to serve
+        logger.warning(f"Model unavailable for {location_name}: {e}")
+        raise HTTPException(status_code=503, detail=f"Model temporarily unavailable: {e}",
+                            headers={"Retry-After": str(e.retry_after)})
+    except (json.JSONDecodeError, ValidationError):
+        logger.error(f"Failed to parse the final agent response: {final_event.content.parts[0].text}")
         raise HTTPException(status_code=500, detail="Agent returned a malformed non-JSON response.")
     except Exception as e:
+        if classify(e) == TRANSIENT:
+            logger.warning(f"Model unavailable for {location_name} after retries: {e}")
+            raise HTTPException(status_code=503, detail=f"Model temporarily unavailable: {e}")
         logger.error(f"An error occurred while processing request for {location_name}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+    finally:
+        if events is not None:
+            events.put_nowait(None)
+
+
+@app.post("/get-location-info",  response_model=LocationData)
+async def get_location_info(request: LocationInfoRequest):
+    location_name = request.location
+    location_type = request.location_type # Capture this from the request
+    logger.info(f"Received request for {location_type}: {location_name}")
+
+    cache = app_state.get("response_cache")
+    if cache is None:
+        raise HTTPException(status_code=500, detail="Server is not initialized properly.")
+
+    cache_key = normalize_location_key(location_name, location_type)
+    prewarm_scheduler = app_state["prewarm_scheduler"]
+    prewarm_scheduler.record(cache_key, location_name, location_type)
+
+    # Identical concurrent requests share one pipeline run
+    with prewarm_scheduler.interactive():
+        location_data, age, status = await cache.get_or_load(
+            cache_key,
+            lambda: run_location_pipeline(location_name, location_type),
+        )
+    # The model is already validated, so serialize it once here instead of
+    # letting FastAPI validate and encode it again through response_model
+    headers = {"X-Cache": status, "Age": str(int(age))}
+    if location_data.partial_sections:
+        headers["X-Partial-Sections"] = ",".join(sorted(location_data.partial_sections))
+    return Response(
+        content=location_data.model_dump_json(),
+        media_type="application/json",
+        headers=headers,
+    )
+
+def _encode_frame(frame: dict, stream_format: str, location_data: Optional[LocationData] = None) -> str:
+    payload = json.dumps(frame)
+    if location_data is not None:
+        # Splice in the model's own compact JSON rather than dumping it to a dict first
+        payload = f'{payload[:-1]}, "data": {location_data.model_dump_json()}}}'
+    if stream_format == "sse":
+        return f"event: {frame['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@app.post("/get-location-info/stream")
+async def stream_location_info(request: LocationInfoRequest, format: str = "ndjson"):
+    """
+    Streams each category as soon as its sub-agent output lands in session
+    state and validates against its own schema piece, then a final frame
+    with the assembled LocationData. A category whose sub-agent misses its
+    deadline arrives with status "stale" (last stored data) or "pending".
+    Frames are NDJSON, or SSE with ?format=sse.
+    """
+    location_name = request.location
+    location_type = request.location_type
+    logger.info(f"Received streaming request for {location_type}: {location_name}")
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'.")
+
+    cache = app_state.get("response_cache")
+    if cache is None:
+        raise HTTPException(status_code=500, detail="Server is not initialized properly.")
+    cache_key = normalize_location_key(location_name, location_type)
+    prewarm_scheduler = app_state["prewarm_scheduler"]
+    prewarm_scheduler.record(cache_key, location_name, location_type)
+
+    # Same key and single-flight as /get-location-info: a stale entry is served
+    # while it refreshes, and a miss either joins the load already in flight or
+    # becomes the load other requests join, streaming its events as they come
+    cached = cache.lookup(cache_key, lambda: run_location_pipeline(location_name, location_type))
+    load, events = None, None
+    if cached is None:
+        check_model_admission()
+        events = asyncio.Queue()
+        load, started = cache.load(cache_key, lambda: run_location_pipeline(location_name, location_type, events))
+        if not started:
+            events = None
+
+    async def frames():
+        started_at = time.perf_counter()
+
+        def elapsed_ms() -> float:
+            return round((time.perf_counter() - started_at) * 1000, 1)
+
+        def whole_sections(location_data: LocationData):
+            for category, section in category_sections(location_data.model_dump(mode="json")).items():
+                yield _encode_frame({"type": "category", "category": category, "status": "ok",
+                                     "data": section, "elapsed_ms": elapsed_ms()}, format)
+
+        if cached is not None:
+            location_data, age, status = cached
+            for frame in whole_sections(location_data):
+                yield frame
+            yield _encode_frame({"type": "location_data", "cache": status, "cache_age_s": int(age),
+                                 "elapsed_ms": elapsed_ms()}, format, location_data)
+            return
+
+        sent = set()
+        try:
+            with prewarm_scheduler.interactive():
+                while events is not None:
+                    event = await events.get()
+                    if event is None:
+                        break
+                    state_delta = (event.actions.state_delta if event.actions else None) or {}
+                    # Categories whose sub-agent missed its deadline or failed: stale data or none yet
+                    partial = state_delta.get("partial_categories", {})
+                    for output_key, value in state_delta.items():
+                        category = CATEGORY_BY_OUTPUT_KEY.get(output_key)
+                        if category is None or category in sent:
+                            continue
+                        try:
+                            section = validate_category(category, value)
+                        except (ValidationError, json.JSONDecodeError):
+                            # FinalProcessorAgent repairs it, the final frame carries the result
+                            yield _encode_frame({"type": "category", "category": category, "status": "pending_repair",
+                                                 "elapsed_ms": elapsed_ms()}, format)
+                            continue
+                        sent.add(category)
+                        frame = {"type": "category", "category": category, "status": "ok",
+                                 "data": section, "elapsed_ms": elapsed_ms()}
+                        if category in partial:
+                            frame.update(status=partial[category]["status"], reason=partial[category]["reason"])
+                        yield _encode_frame(frame, format)
+                    for category, section in partial.items():
+                        if category not in sent:
+                            sent.add(category)
+                            yield _encode_frame({"type": "category", "category": category, **section,
+                                                 "elapsed_ms": elapsed_ms()}, format)
+
+                # Shield so a disconnecting client does not cancel the shared load
+                location_data = await asyncio.shield(load)
+            if events is None:
+                # Joined another request's load, so no per-category events were seen
+                for frame in whole_sections(location_data):
+                    yield frame
+            yield _encode_frame({"type": "location_data", "cache": MISS, "elapsed_ms": elapsed_ms()},
+                                format, location_data)
+        except HTTPException as e:
+            yield _encode_frame({"type": "error", "message": e.detail}, format)
+        except Exception as e:
+            logger.error(f"Streaming request for {location_name} failed: {e}", exc_info=True)
+            yield _encode_frame({"type": "error", "message": f"An internal error occurred: {e}"}, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(frames(), media_type=media_type)
+
+
+def _snapshot_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+@app.get("/locations/latest", response_model=LocationData)
+async def latest_location_snapshot(location: str, location_type: str = "city"):
+    """
+    Serves the latest stored snapshot of each category straight from the
+    snapshot store, without running the agent pipeline.
+    """
+    store = app_state.get("snapshot_store")
+    if store is None:
+        raise HTTPException(status_code=500, detail="Server is not initialized properly.")
+    snapshots = await asyncio.to_thread(store.latest, location, location_type)
+    if not snapshots:
+        raise HTTPException(status_code=404, detail=f"No stored data for {location_type}: {location}.")
+
+    newest = max(snapshots.values(), key=lambda snapshot: snapshot.fetched_at)
+    oldest = min(snapshot.fetched_at for snapshot in snapshots.values())
+    location_data = LocationData.model_validate(assemble_location_data(
+        newest.location, {category: snapshot.payload for category, snapshot in snapshots.items()},
+    ))
+    return Response(
+        content=location_data.model_dump_json(),
+        media_type="application/json",
+        headers={
+            "Age": str(int(time.time() - oldest)),
+            "X-Snapshot-Categories": ",".join(sorted(snapshots)),
+        },
+    )
+
+
+@app.get("/locations/history")
+async def location_history(location: str, location_type: str = "city", category: Optional[str] = None,
+                           since: Optional[datetime] = None, until: Optional[datetime] = None,
+                           limit: int = Query(100, ge=1, le=1000)):
+    """Stored snapshots fetched between `since` and `until` (ISO 8601), newest first."""
+    store = app_state.get("snapshot_store")
+    if store is None:
+        raise HTTPException(status_code=500, detail="Server is not initialized properly.")
+    if category is not None and category not in CATEGORY_SPECS:
+        raise HTTPException(status_code=400, detail=f"category must be one of {sorted(CATEGORY_SPECS)}.")
+
+    snapshots = await asyncio.to_thread(
+        store.history, location, location_type, category,
+        since.timestamp() if since else None, until.timestamp() if until else None, limit,
+    )
+    return [
+        {"category": snapshot.category, "fetched_at": _snapshot_time(snapshot.fetched_at), "data": snapshot.payload}
+        for snapshot in snapshots
+    ]
+
+
+def _check_admin_token(token: Optional[str]):
+    # Fail closed: with no ADMIN_TOKEN configured the admin endpoints stay disabled
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them.")
+    if token is None or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@app.get("/admin/prewarm")
+async def prewarm_status(x_admin_token: Optional[str] = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    return app_state["prewarm_scheduler"].status()
+
+
+@app.post("/admin/prewarm")
+async def prewarm_control(command: PrewarmCommand, x_admin_token: Optional[str] = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    scheduler = app_state["prewarm_scheduler"]
+    if command.top_n is not None:
+        scheduler.top_n = command.top_n
+
+    if command.action == "start":
+        scheduler.start()
+    elif command.action == "stop":
+        await scheduler.stop()
+    elif command.action == "run_now":
+        scheduled = scheduler.run_once()
+        return {**scheduler.status(), "scheduled": len(scheduled)}
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown action '{command.action}'.")
+    return scheduler.status()
+
+
+@app.get("/admin/artifacts")
+async def artifact_writer_status(x_admin_token: Optional[str] = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    return app_state["artifact_writer"].stats()
+
+
+@app.get("/admin/limiter")
+async def model_limiter_status(x_admin_token: Optional[str] = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    return {"enabled": MODEL_LIMITER_ENABLED, **app_state["model_limiter"].stats()}
+
+
+@app.get("/admin/resilience")
+async def resilience_status(x_admin_token: Optional[str] = Header(default=None)):
+    """Retry budget and per-model circuit breaker state."""
+    _check_admin_token(x_admin_token)
+    return resilience_stats()
+
+
+@app.get("/admin/usage")
+async def token_usage_status(x_admin_token: Optional[str] = Header(default=None)):
+    """Model token usage and estimated cost, per agent and for the costliest locations."""
+    _check_admin_token(x_admin_token)
+    return usage_totals.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-stage durations and model token usage."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 
 @app.get("/")
 def read_root(): return {"status": "MetroPulse API is running"}
\ No newline at end of file
@@ -0,0 +1,188 @@
+# prewarm_scheduler.py
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from metropulse_common.model_limiter import BACKGROUND, traffic_lane
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "10"))
+# Upper bound for top_n set through the admin endpoint
+PREWARM_MAX_TOP_N = 100
+PREWARM_INTERVAL_S = float(os.getenv("PREWARM_INTERVAL_S", "60"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+# Refresh once an entry has used up this fraction of its TTL
+PREWARM_REFRESH_AT = float(os.getenv("PREWARM_REFRESH_AT", "0.8"))
+# Random delay spread across refreshes so they do not all start together
+PREWARM_JITTER_S = float(os.getenv("PREWARM_JITTER_S", "15"))
+# Background work waits while more interactive requests than this are in flight
+PREWARM_MAX_INTERACTIVE = int(os.getenv("PREWARM_MAX_INTERACTIVE", "2"))
+# Request counts decay with this half-life so popularity follows recent traffic
+PREWARM_HALF_LIFE_S = float(os.getenv("PREWARM_HALF_LIFE_S", "3600"))
+# Locations are client-supplied, so the tracked set is bounded: entries whose
+# decayed score falls below PREWARM_MIN_SCORE are dropped each cycle, and
+# past PREWARM_MAX_TRACKED the lowest scores go first
+PREWARM_MAX_TRACKED = int(os.getenv("PREWARM_MAX_TRACKED", "10000"))
+PREWARM_MIN_SCORE = float(os.getenv("PREWARM_MIN_SCORE", "0.01"))
+
+Loader = Callable[[str, str], Awaitable[Any]]
+
+
+class PrewarmScheduler:
+    """
+    Keeps the most requested locations refreshed in the background, ahead of
+    their cache expiry.
+
+    Background refreshes share a global concurrency cap, are staggered with
+    random jitter, and yield to interactive traffic.
+    """
+
+    def __init__(self, cache: ResponseCache, loader: Loader, top_n: int = PREWARM_TOP_N,
+                 interval_s: float = PREWARM_INTERVAL_S, concurrency: int = PREWARM_CONCURRENCY):
+        self.cache = cache
+        self.loader = loader
+        self.top_n = top_n
+        self.interval_s = interval_s
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._scores: Dict[Hashable, Tuple[float, float]] = {}  # key -> (score, updated_at)
+        self._locations: Dict[Hashable, Tuple[str, str]] = {}
+        self._pending: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self.interactive_inflight = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.last_cycle_at: Optional[float] = None
+
+    # --- request tracking ---
+
+    def _decayed(self, key: Hashable, now: float) -> float:
+        score, updated_at = self._scores.get(key, (0.0, now))
+        return score * math.pow(0.5, (now - updated_at) / PREWARM_HALF_LIFE_S)
+
+    def record(self, key: Hashable, location: str, location_type: str):
+        now = time.time()
+        self._scores[key] = (self._decayed(key, now) + 1.0, now)
+        self._locations[key] = (location, location_type)
+        if len(self._scores) > PREWARM_MAX_TRACKED:
+            self._prune(now, PREWARM_MAX_TRACKED * 9 // 10)
+
+    def _prune(self, now: float, max_entries: Optional[int] = None):
+        """Forget locations with a negligible score, then the lowest scored beyond max_entries."""
+        scored = sorted(((self._decayed(key, now), key) for key in self._scores if key not in self._pending),
+                        key=lambda item: item[0])
+        excess = len(self._scores) - max_entries if max_entries is not None else 0
+        for index, (score, key) in enumerate(scored):
+            if score >= PREWARM_MIN_SCORE and index >= excess:
+                break
+            del self._scores[key]
+            del self._locations[key]
+
+    @contextmanager
+    def interactive(self):
+        """Marks an interactive request as in flight for the duration of the block."""
+        self.interactive_inflight += 1
+        try:
+            yield
+        finally:
+            self.interactive_inflight -= 1
+
+    def top_locations(self) -> List[Tuple[Hashable, float]]:
+        now = time.time()
+        ranked = sorted(((key, self._decayed(key, now)) for key in self._scores), key=lambda kv: kv[1], reverse=True)
+        return ranked[:self.top_n]
+
+    # --- refreshing ---
+
+    def _is_due(self, key: Hashable) -> bool:
+        age = self.cache.age(key)
+        return age is None or age >= self.cache.ttl_s * PREWARM_REFRESH_AT
+
+    async def _wait_for_quiet(self):
+        while self.interactive_inflight > PREWARM_MAX_INTERACTIVE:
+            await asyncio.sleep(1)
+
+    async def _refresh(self, key: Hashable):
+        location, location_type = self._locations[key]
+        try:
+            await asyncio.sleep(random.uniform(0, PREWARM_JITTER_S))
+            async with self._semaphore:
+                await self._wait_for_quiet()
+                # Model calls for refreshes queue behind interactive traffic
+                with traffic_lane(BACKGROUND):
+                    await self.cache.refresh(key, lambda: self.loader(location, location_type))
+            self.refreshes += 1
+            logger.info(f"Pre-warmed {location_type}: {location}")
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Pre-warm of {location} failed: {e}")
+        finally:
+            self._pending.discard(key)
+
+    def run_once(self) -> List[Hashable]:
+        """Schedule refreshes for every top location that is due; returns the scheduled keys."""
+        self.last_cycle_at = time.time()
+        self._prune(self.last_cycle_at)
+        scheduled = []
+        for key, _ in self.top_locations():
+            if key in self._pending or not self._is_due(key):
+                continue
+            self._pending.add(key)
+            task = asyncio.create_task(self._refresh(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            scheduled.append(key)
+        return scheduled
+
+    async def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Pre-warm cycle failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_s)
+
+    # --- control ---
+
+    @property
+    def running(self) -> bool:
+        return self._loop_task is not None and not self._loop_task.done()
+
+    def start(self):
+        if not self.running:
+            self._loop_task = asyncio.create_task(self._loop())
+            logger.info("Pre-warm scheduler started.")
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info("Pre-warm scheduler stopped.")
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "top_n": self.top_n,
+            "interval_s": self.interval_s,
+            "interactive_inflight": self.interactive_inflight,
+            "pending": len(self._pending),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_cycle_at": self.last_cycle_at,
+            "top_locations": [
+                {"location": self._locations[key][0], "location_type": self._locations[key][1],
+                 "score": round(score, 3), "cache_age_s": self.cache.age(key)}
+                for key, score in self.top_locations()
+            ],
+        }
@@ -0,0 +1,158 @@
+# response_cache.py
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCATION_CACHE_TTL_S = float(os.getenv("LOCATION_CACHE_TTL_S", "900"))
+# How long past the TTL a stale entry may still be served while it refreshes
+LOCATION_CACHE_STALE_S = float(os.getenv("LOCATION_CACHE_STALE_S", "3600"))
+LOCATION_CACHE_MAX_ENTRIES = int(os.getenv("LOCATION_CACHE_MAX_ENTRIES", "1000"))
+
+HIT, STALE, MISS = "HIT", "STALE", "MISS"
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    created_at: float
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class ResponseCache:
+    """
+    TTL cache with stale-while-revalidate and single-flight loading.
+
+    Concurrent misses for the same key share one loader call; a stale entry
+    is served immediately while one background refresh replaces it. Values
+    `cacheable` rejects are still returned to their callers, just not kept.
+    """
+
+    def __init__(self, ttl_s: float, stale_s: float, max_entries: int,
+                 cacheable: Optional[Callable[[Any], bool]] = None):
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+        self.cacheable = cacheable
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _store(self, key: Hashable, value: Any):
+        if self.cacheable is not None and not self.cacheable(value):
+            return
+        self._entries[key] = CacheEntry(value=value, created_at=time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start the loader for `key` unless one is already running."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        async def run():
+            try:
+                value = await loader()
+                self._store(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.create_task(run())
+        self._inflight[key] = task
+        return task
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        if key in self._inflight:
+            return
+        task = self._load(key, loader)
+        self._background.add(task)
+
+        def done(t: asyncio.Task):
+            self._background.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                logger.warning(f"Background refresh for {key} failed: {t.exception()}")
+
+        task.add_done_callback(done)
+
+    def lookup(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Optional[Tuple[Any, float, str]]:
+        """
+        (value, age, HIT/STALE) for a servable entry, starting a background
+        refresh if it is stale; None on a miss, without loading.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = entry.age
+        if age < self.ttl_s:
+            self.hits += 1
+            return entry.value, age, HIT
+        if age < self.ttl_s + self.stale_s:
+            self.stale_hits += 1
+            self._refresh_in_background(key, loader)
+            return entry.value, age, STALE
+        return None
+
+    def load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Task, bool]:
+        """
+        Count a miss and start the single-flight load for `key`, or join the
+        one in flight. Returns the task and whether this call started it.
+        """
+        self.misses += 1
+        started = key not in self._inflight
+        return self._load(key, loader), started
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, float, str]:
+        """Return (value, age in seconds, HIT/STALE/MISS)."""
+        cached = self.lookup(key, loader)
+        if cached is not None:
+            return cached
+
+        task, _ = self.load(key, loader)
+        # Shield so a disconnecting client does not cancel the shared load
+        value = await asyncio.shield(task)
+        return value, 0.0, MISS
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """(value, age) if a servable (fresh or stale) entry exists, without loading."""
+        entry = self._entries.get(key)
+        if entry is None or entry.age >= self.ttl_s + self.stale_s:
+            return None
+        return entry.value, entry.age
+
+    def put(self, key: Hashable, value: Any):
+        self._store(key, value)
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Age of the cached entry in seconds, or None if nothing is cached."""
+        entry = self._entries.get(key)
+        return entry.age if entry is not None else None
+
+    async def refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Reload `key` now, joining an in-flight load if there is one."""
+        return await asyncio.shield(self._load(key, loader))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }